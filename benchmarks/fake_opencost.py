@@ -0,0 +1,153 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+try:
+    from . import synth
+except ImportError:  # running as a script
+    import synth
+
+ALLOCATION_PATH = "/model/allocation/compute"
+BODY_CACHE_SIZE = 64  # generated bodies kept, so benchmarks measure the client rather than the generator
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like OpenCost behind its Go HTTP server
+    server_version = "fake-opencost"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        # '/<cluster>/model/allocation/compute' serves another cluster from the same server
+        prefix, _, path = url.path.rpartition(ALLOCATION_PATH)
+        cluster = prefix.strip("/") or self.server.clusters[0]
+        if path or cluster not in self.server.clusters:
+            self._reply(404, json.dumps({"code": 404, "status": "error", "message": "not found"}).encode())
+            return
+
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            body = self.server.body(
+                cluster,
+                params.get("window", "1d"),
+                params.get("aggregate", "namespace"),
+                params.get("accumulate", "false") == "true",
+            )
+        except ValueError as e:
+            self._reply(400, json.dumps({"code": 400, "status": "error", "message": str(e)}).encode())
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.server.requests += 1
+        self.server.bytes_sent += len(body)
+        self._reply(200, body)
+
+
+class FakeOpenCost(ThreadingHTTPServer):
+    """
+    Local stand-in for the OpenCost allocation API serving synthetic payloads.
+
+    Every cluster has the same shape (namespaces x pods) with its own seeded usage. The first cluster is
+    served at /model/allocation/compute, every cluster at /<cluster>/model/allocation/compute.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, namespaces, pods, clusters=("cluster-one",), host="127.0.0.1", port=0, latency=0.0,
+                 seed=0, verbose=False):
+        """
+        Parameters:
+        - namespaces (int): Namespaces per cluster.
+        - pods (int): Pods per namespace.
+        - clusters (tuple): Cluster names.
+        - host, port: Address to listen on; port 0 picks a free port.
+        - latency (float): Seconds added to every response, to mimic a remote cluster.
+        - seed (int): Random seed of the synthetic usage.
+        - verbose (bool): Log every request.
+        """
+        super().__init__((host, port), _Handler)
+        self.namespaces = namespaces
+        self.pods = pods
+        self.clusters = list(clusters)
+        self.latency = latency
+        self.seed = seed
+        self.verbose = verbose
+        self.requests = 0
+        self.bytes_sent = 0
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def body(self, cluster, window, aggregate, accumulate):
+        key = (cluster, window, aggregate, accumulate)
+        with self._lock:
+            if key in self._bodies:
+                self._bodies.move_to_end(key)
+                return self._bodies[key]
+        body = synth.response_body(self.namespaces, self.pods, window, aggregate, accumulate, cluster, self.seed)
+        with self._lock:
+            self._bodies[key] = body
+            while len(self._bodies) > BODY_CACHE_SIZE:
+                self._bodies.popitem(last=False)
+        return body
+
+    def endpoint(self, cluster):
+        """
+        Returns the base URL to use for a cluster, e.g. with --endpoints.
+        """
+        host, port = self.server_address[:2]
+        if cluster == self.clusters[0]:
+            return f"http://{host}:{port}"
+        return f"http://{host}:{port}/{cluster}"
+
+    def endpoints(self):
+        """
+        Returns {cluster: base URL} for every cluster.
+        """
+        return {cluster: self.endpoint(cluster) for cluster in self.clusters}
+
+    def start(self):
+        """
+        Serves in a daemon thread and returns the server.
+        """
+        threading.Thread(target=self.serve_forever, name="fake-opencost", daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic OpenCost allocation data.")
+    parser.add_argument("--namespaces", type=int, default=50)
+    parser.add_argument("--pods", type=int, default=20, help="Pods per namespace")
+    parser.add_argument("--clusters", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    clusters = [f"cluster-{index + 1}" for index in range(args.clusters)]
+    server = FakeOpenCost(args.namespaces, args.pods, clusters, args.host, args.port, args.latency, args.seed,
+                          verbose=True)
+    print(f"Serving {args.namespaces} namespaces x {args.pods} pods per cluster")
+    print("Endpoints: " + ",".join(f"{name}={url}" for name, url in server.endpoints().items()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
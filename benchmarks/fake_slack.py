@@ -0,0 +1,215 @@
+import argparse
+import email
+import email.policy
+import hashlib
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+UPLOAD_PATH = "/upload/"
+
+
+def _form(content_type, body):
+    """
+    Parses a urlencoded or multipart form body into {field: str or bytes}.
+    """
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return dict(parse_qsl(body.decode()))
+    message = email.message_from_bytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body, policy=email.policy.HTTP
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        data = part.get_payload(decode=True)
+        fields[name] = data if part.get_filename() else data.decode()
+    return fields
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "fake-slack"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, body, status=200, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/uploads":
+            self._reply({"ok": True, "uploads": self.server.uploads})
+            return
+        self._reply({"ok": False, "error": "unknown_method"}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if url.path.startswith(UPLOAD_PATH):
+            # Step 2 of an upload: the raw file content, sent to the URL handed out in step 1
+            if not self.server.receive(url.path[len(UPLOAD_PATH):], body):
+                self._reply({"ok": False, "error": "invalid_upload_url"}, 404)
+                return
+            self._reply({"ok": True})
+            return
+
+        method = url.path.rsplit("/", 1)[-1]
+        if method not in ("files.getUploadURLExternal", "files.completeUploadExternal"):
+            self._reply({"ok": False, "error": "unknown_method"}, 404)
+            return
+        if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            self._reply({"ok": False, "error": "not_authed"})
+            return
+        form = {**dict(parse_qsl(url.query)), **_form(self.headers.get("Content-Type", ""), body)}
+
+        if method == "files.getUploadURLExternal":
+            file_id = self.server.reserve(form.get("filename"))
+            host, port = self.server.server_address[:2]
+            self._reply({"ok": True, "file_id": file_id, "upload_url": f"http://{host}:{port}{UPLOAD_PATH}{file_id}"})
+            return
+
+        retry_after = self.server.throttle()
+        if retry_after:
+            self._reply({"ok": False, "error": "ratelimited"}, 429, {"Retry-After": str(retry_after)})
+            return
+
+        channels = [channel for channel in (form.get("channels") or form.get("channel_id") or "").split(",") if channel]
+        unknown = [channel for channel in channels if self.server.channels and channel not in self.server.channels]
+        if unknown:
+            self._reply({"ok": False, "error": "channel_not_found"})
+            return
+
+        files = []
+        for requested in json.loads(form.get("files") or "[]"):
+            pending = self.server.complete(requested["id"])
+            if pending is None or pending["data"] is None:
+                self._reply({"ok": False, "error": "file_not_found"})
+                return
+            upload = {
+                "id": requested["id"],
+                "name": pending["name"],
+                "title": requested.get("title"),
+                "channels": channels,
+                "initial_comment": form.get("initial_comment"),
+                "size": len(pending["data"]),
+                "sha256": hashlib.sha256(pending["data"]).hexdigest(),
+            }
+            with self.server.lock:
+                self.server.uploads.append(upload)
+            files.append({"id": upload["id"], "name": upload["name"], "title": upload["title"]})
+        self._reply({"ok": True, "files": files})
+
+
+class FakeSlack(ThreadingHTTPServer):
+    """
+    Local stand-in for the Slack Web API's external file uploads (files.getUploadURLExternal, the upload URL
+    and files.completeUploadExternal), with rate limiting and unknown channels.
+
+    Point the tool at it with SLACK_API_URL=http://host:port/api/ and any SLACK_API_TOKEN. Recorded uploads
+    are listed at /uploads.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, rate_limit=None, channels=None, verbose=False):
+        """
+        Parameters:
+        - host, port: Address to listen on; port 0 picks a free port.
+        - rate_limit (int): Completed uploads accepted per second before answering 429 with a Retry-After.
+        - channels (list): Known channels; uploads to any other fail with channel_not_found. All are known if None.
+        - verbose (bool): Log every request.
+        """
+        super().__init__((host, port), _Handler)
+        self.rate_limit = rate_limit
+        self.channels = set(channels or ())
+        self.verbose = verbose
+        self.uploads = []
+        self.lock = threading.Lock()
+        self._pending = {}  # file id -> {'name', 'data'} of uploads not completed yet
+        self._ids = itertools.count(1)
+        self._window = (0, 0)  # (second, uploads accepted in it)
+
+    @property
+    def api_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    def reserve(self, filename):
+        """
+        Returns the id of a new pending upload.
+        """
+        with self.lock:
+            file_id = f"F{next(self._ids):08d}"
+            self._pending[file_id] = {"name": filename, "data": None}
+            return file_id
+
+    def receive(self, file_id, data):
+        """
+        Stores the content of a pending upload; returns False if the id is unknown.
+        """
+        with self.lock:
+            if file_id not in self._pending:
+                return False
+            self._pending[file_id]["data"] = data
+            return True
+
+    def complete(self, file_id):
+        """
+        Removes and returns a pending upload, or None if the id is unknown.
+        """
+        with self.lock:
+            return self._pending.pop(file_id, None)
+
+    def throttle(self):
+        """
+        Counts an upload against the rate limit; returns the seconds to wait if it is over the limit, else 0.
+        """
+        if not self.rate_limit:
+            return 0
+        with self.lock:
+            second = int(time.time())
+            start, count = self._window
+            if start != second:
+                start, count = second, 0
+            if count >= self.rate_limit:
+                return 1
+            self._window = (start, count + 1)
+            return 0
+
+    def start(self):
+        """
+        Serves in a daemon thread and returns the server.
+        """
+        threading.Thread(target=self.serve_forever, name="fake-slack", daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Slack file upload API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9292)
+    parser.add_argument("--rate-limit", type=int, default=None, help="Uploads per second before answering 429")
+    parser.add_argument("--channels", default="", help="Comma separated known channels (default is any channel)")
+    args = parser.parse_args(argv)
+
+    server = FakeSlack(args.host, args.port, args.rate_limit, [c for c in args.channels.split(",") if c], verbose=True)
+    print(f"SLACK_API_URL={server.api_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
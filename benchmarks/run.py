@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synth  # noqa: E402
+from benchmarks.fake_opencost import ALLOCATION_PATH  # noqa: E402
+from tools.costs import chunked, fanout, render, rollup, tracing  # noqa: E402
+from tools.costs import frame as cost_frame  # noqa: E402
+from tools.costs import main as report  # noqa: E402
+
+DEFAULT_ENTRIES = [10, 100, 1000, 10000, 100000]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+STEPS = ["fetch", "transform", "rank", "render"]
+STAGES = ["fetch", "parse", "transform", "rank", "render"]  # parse is timed within the fetch step
+DEFAULT_THRESHOLD = 1.25  # slowdown ratio reported as a regression by --compare
+FETCH_TIMEOUT = 600.0
+
+
+class Pipeline:
+    """
+    The report pipeline split into separately timed stages, run against a fake OpenCost server.
+
+    Each step calls the functions the report uses, mirroring query_rollup -> prettier_data ->
+    render_treemap in main.py: the days are fetched with main.fetch_days (parallel per-day requests whose
+    bodies are parsed while they stream in), merged and rolled up, ranked and formatted, then rendered as a
+    treemap. The allocation cache is bypassed so every run fetches.
+
+    Download and parsing overlap, so they run as one step and are told apart with the report's own decode
+    spans: the parse stage is the time the spans spent outside of reading the body (read_seconds), and the
+    fetch stage the rest of the step.
+    """
+
+    def __init__(self, endpoints, days, renderer, session):
+        self.renderer = renderer
+        self.session = session
+        self.endpoints = endpoints
+        self.parse_seconds = 0.0
+        self.payload_bytes = 0
+        self.levels = (["cluster"] if len(self.endpoints) > 1 else []) + ["namespace", "pod"]
+        self.aggregate = rollup.aggregate_for([level for level in self.levels if level != "cluster"])
+        end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.days = [end - timedelta(days=offset) for offset in range(days, 0, -1)]
+
+    def fetch(self, _):
+        def fetch_days(base_url, session, timeout):
+            return report.fetch_days(f"{base_url}{ALLOCATION_PATH}", self.days, self.aggregate, session, timeout)
+
+        # A tracer of its own, so the decode spans of this step are all there is
+        traced, tracing.TRACER = tracing.TRACER, tracing.Tracer(enabled=True)
+        try:
+            days, errors = fanout.fan_out(self.endpoints, fetch_days, timeout=FETCH_TIMEOUT, session=self.session)
+            decodes = [event for event in tracing.TRACER.trace()["traceEvents"] if event["name"] == "decode"]
+        finally:
+            tracing.TRACER = traced
+        self.parse_seconds = sum(
+            event["dur"] / 1e6 - float(event["args"].get("read_seconds", 0.0)) for event in decodes
+        )
+        self.payload_bytes = sum(event["args"]["bytes"] for event in decodes)
+        if errors:
+            raise RuntimeError(f"Fetch failed: {errors}")
+        return days
+
+    def transform(self, days):
+        frames = {
+            cluster: report.accumulate_days(self.endpoints[cluster], cluster_days)
+            for cluster, cluster_days in days.items()
+        }
+        costs = cost_frame.concat(frames) if len(frames) > 1 else next(iter(frames.values()))
+        return rollup.RollupIndex.from_frame(costs, self.levels)
+
+    def rank(self, index):
+        ranked, path = index.view()
+        return ranked, path, report.prettier_data(ranked)
+
+    def render(self, ranked):
+        if self.renderer == "none":
+            return None
+        frame, path, _ = ranked
+        with tempfile.TemporaryDirectory() as cache_dir:
+            image = report.render_treemap(frame, path, "All", self.renderer, render.RenderCache(cache_dir))
+            return os.path.getsize(image)
+
+    def run(self, trace_memory=False):
+        """
+        Runs every step once.
+
+        Returns:
+        - Dict of stage -> {'seconds': wall time} plus 'peak_bytes' (Python heap high-water mark of the step,
+          NumPy buffers included, shared by fetch and parse) when trace_memory is set.
+        """
+        stages = {}
+        value = None
+        for step in STEPS:
+            if trace_memory:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            value = getattr(self, step)(value)
+            stages[step] = {"seconds": time.perf_counter() - started}
+            if step == "fetch":
+                # Requests parse in parallel, their summed parse time can exceed the wall time of the step
+                parse = min(self.parse_seconds, stages["fetch"]["seconds"])
+                stages["fetch"]["seconds"] -= parse
+                stages["parse"] = {"seconds": parse}
+            if trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - before
+                for stage in ("fetch", "parse") if step == "fetch" else (step,):
+                    stages[stage]["peak_bytes"] = peak
+        return stages
+
+
+def start_fake_opencost(namespaces, pods, clusters, seed=0):
+    """
+    Starts benchmarks/fake_opencost.py in a process of its own, so generating and caching the payloads does
+    not count towards the memory of the pipeline.
+
+    Returns:
+    - Tuple of (process, {cluster: base URL}).
+    """
+    process = subprocess.Popen(
+        [
+            sys.executable, "-u", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_opencost.py"),
+            "--namespaces", str(namespaces), "--pods", str(pods), "--clusters", str(clusters), "--port", "0",
+            "--seed", str(seed),
+        ],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    for line in process.stdout:
+        if line.startswith("Endpoints: "):
+            return process, fanout.parse_endpoints(line[len("Endpoints: "):])
+    raise RuntimeError(f"Fake OpenCost exited with status {process.wait()}")
+
+
+def benchmark(entries, namespaces=None, days=1, clusters=1, repeat=3, renderer="svg", seed=0):
+    """
+    Benchmarks the pipeline for one payload size.
+
+    Parameters:
+    - entries (int): Allocations per cluster and day.
+    - namespaces (int): Namespace count, see synth.sizes.
+    - days (int): Days in the window; each is fetched with its own request.
+    - clusters (int): Clusters queried concurrently.
+    - repeat (int): Timed runs; the median and the fastest are reported.
+    - renderer (str): Treemap renderer, see main.render_treemap, or 'none'.
+    - seed (int): Random seed of the synthetic payloads.
+
+    Returns:
+    - Result dict for the results file.
+    """
+    namespaces, pods = synth.sizes(entries, namespaces)
+    server, endpoints = start_fake_opencost(namespaces, pods, clusters, seed)
+    # Every cluster is served by the same fake server, so its one host pool takes all their requests
+    session = fanout.make_session(chunked.DEFAULT_MAX_WORKERS * clusters)
+    try:
+        pipeline = Pipeline(endpoints, days, renderer, session)
+        # Warm up: generate the payloads server side and open the connections, untimed
+        started = time.perf_counter()
+        pipeline.fetch(None)
+        generate_seconds = time.perf_counter() - started
+        payload_bytes = pipeline.payload_bytes
+
+        runs = [pipeline.run() for _ in range(repeat)]
+        tracemalloc.start()
+        try:
+            traced = pipeline.run(trace_memory=True)
+        finally:
+            tracemalloc.stop()
+    finally:
+        session.close()
+        server.terminate()
+        server.wait()
+
+    stages = {}
+    for stage in STAGES:
+        seconds = [run[stage]["seconds"] for run in runs]
+        stages[stage] = {
+            "median_seconds": statistics.median(seconds),
+            "min_seconds": min(seconds),
+            "peak_bytes": traced[stage]["peak_bytes"],
+        }
+    return {
+        "entries": namespaces * pods,
+        "namespaces": namespaces,
+        "pods_per_namespace": pods,
+        "days": days,
+        "clusters": clusters,
+        "payload_bytes": payload_bytes,
+        "generate_seconds": generate_seconds,
+        "total_median_seconds": sum(stage["median_seconds"] for stage in stages.values()),
+        "stages": stages,
+        "max_rss_bytes": tracing.peak_rss(),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Prints the median slowdown of every stage against a baseline results file.
+
+    Returns:
+    - List of (entries, stage, ratio) whose slowdown exceeds threshold.
+    """
+    previous = {(run["entries"], run["days"], run["clusters"]): run for run in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'} ({baseline['started']}):")
+    for run in results["results"]:
+        before = previous.get((run["entries"], run["days"], run["clusters"]))
+        if before is None:
+            continue
+        for stage in STAGES:
+            if stage not in before["stages"]:
+                continue
+            old, new = before["stages"][stage]["median_seconds"], run["stages"][stage]["median_seconds"]
+            ratio = new / old if old else 1.0
+            flag = ""
+            if ratio > threshold:
+                regressions.append((run["entries"], stage, ratio))
+                flag = "  REGRESSION"
+            print(f"{run['entries']:>8} {stage:<10} {old * 1000:10.2f}ms -> {new * 1000:10.2f}ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def _print_run(run):
+    stages = "  ".join(
+        f"{stage} {run['stages'][stage]['median_seconds'] * 1000:.1f}ms/{run['stages'][stage]['peak_bytes'] / 2 ** 20:.1f}MB"
+        for stage in STAGES
+    )
+    print(f"{run['entries']:>8} entries  {run['payload_bytes'] / 2 ** 20:8.1f}MB  {stages}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the cost report pipeline against a local fake OpenCost server.",
+    )
+    parser.add_argument("--entries", default=",".join(map(str, DEFAULT_ENTRIES)),
+                        help="Comma separated allocations per cluster and day to benchmark")
+    parser.add_argument("--namespaces", type=int, help="Fixed namespace count (default is sqrt(entries))")
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--clusters", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--renderer", default="svg", choices=report.RENDERERS + ["none"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default is benchmarks/results/<time>-<revision>.json)")
+    parser.add_argument("--compare", help="Results file of a previous run to compare the medians with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown ratio that --compare reports as a regression (exit status 1)")
+    args = parser.parse_args(argv)
+
+    started = datetime.now(timezone.utc)
+    results = {
+        "started": started.isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "days": args.days,
+            "clusters": args.clusters,
+            "repeat": args.repeat,
+            "renderer": args.renderer,
+            "seed": args.seed,
+        },
+        "results": [],
+    }
+    for entries in (int(value) for value in args.entries.split(",") if value):
+        run = benchmark(entries, args.namespaces, args.days, args.clusters, args.repeat, args.renderer, args.seed)
+        _print_run(run)
+        results["results"].append(run)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{started:%Y%m%d-%H%M%S}-{results['revision'] or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
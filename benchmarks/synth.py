@@ -0,0 +1,195 @@
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+# Hourly prices used to derive costs from the synthetic usage
+CPU_HOURLY = 0.031611
+RAM_GB_HOURLY = 0.004237
+
+
+def namespace_names(namespaces):
+    return [f"ns-{index:05d}" for index in range(namespaces)]
+
+
+def pod_names(namespace, pods):
+    return [f"{namespace}-pod-{index:05d}" for index in range(pods)]
+
+
+def sizes(entries, namespaces=None):
+    """
+    Splits a number of allocation entries into namespaces and pods per namespace.
+
+    Parameters:
+    - entries (int): Allocations per cluster and day.
+    - namespaces (int): Fixed namespace count, defaults to about the square root of entries.
+
+    Returns:
+    - Tuple of (namespaces, pods per namespace).
+    """
+    namespaces = namespaces or max(1, round(entries ** 0.5))
+    return namespaces, max(1, entries // namespaces)
+
+
+def _allocation(rng, cluster, namespace, pod, start, end, hours):
+    cpu_cores = rng.lognormvariate(-1.5, 1.2)
+    ram_gb = rng.lognormvariate(-0.5, 1.0)
+    cpu_efficiency = min(rng.betavariate(2, 5), 1.0)
+    ram_efficiency = min(rng.betavariate(3, 3), 1.0)
+    cpu_cost = cpu_cores * CPU_HOURLY * hours
+    ram_cost = ram_gb * RAM_GB_HOURLY * hours
+    total_efficiency = (cpu_efficiency * cpu_cost + ram_efficiency * ram_cost) / (cpu_cost + ram_cost)
+    return {
+        "properties": {
+            "cluster": cluster,
+            "namespace": namespace,
+            "controller": pod.rsplit("-pod-", 1)[0],
+            "controllerKind": "deployment",
+            "pod": pod,
+        },
+        "window": {"start": f"{start:%Y-%m-%dT%H:%M:%SZ}", "end": f"{end:%Y-%m-%dT%H:%M:%SZ}"},
+        "start": f"{start:%Y-%m-%dT%H:%M:%SZ}",
+        "end": f"{end:%Y-%m-%dT%H:%M:%SZ}",
+        "minutes": hours * 60,
+        "cpuCores": cpu_cores,
+        "cpuCoreRequestAverage": cpu_cores * 1.5,
+        "cpuCoreUsageAverage": cpu_cores * cpu_efficiency * 1.5,
+        "cpuCoreHours": cpu_cores * hours,
+        "cpuCost": cpu_cost,
+        "cpuEfficiency": cpu_efficiency,
+        "ramBytes": ram_gb * 1024 ** 3,
+        "ramByteRequestAverage": ram_gb * 1.5 * 1024 ** 3,
+        "ramByteUsageAverage": ram_gb * ram_efficiency * 1.5 * 1024 ** 3,
+        "ramByteHours": ram_gb * hours * 1024 ** 3,
+        "ramCost": ram_cost,
+        "ramEfficiency": ram_efficiency,
+        "gpuCost": 0.0,
+        "networkCost": rng.random() * 0.01 * hours,
+        "loadBalancerCost": 0.0,
+        "pvCost": 0.0,
+        "sharedCost": 0.0,
+        "externalCost": 0.0,
+        "totalCost": cpu_cost + ram_cost,
+        "totalEfficiency": total_efficiency,
+    }
+
+
+def _idle(cluster, start, end, hours):
+    return {
+        "name": "__idle__",
+        "properties": {"cluster": cluster},
+        "window": {"start": f"{start:%Y-%m-%dT%H:%M:%SZ}", "end": f"{end:%Y-%m-%dT%H:%M:%SZ}"},
+        "cpuCost": 0.4 * hours,
+        "ramCost": 0.1 * hours,
+        "totalCost": 0.5 * hours,
+    }
+
+
+def allocation_set(namespaces, pods, start, end, cluster="cluster-one", aggregate="namespace,pod", seed=0):
+    """
+    Generates one OpenCost allocation set covering [start, end).
+
+    The same seed, cluster and start always produce the same allocations, so repeated requests for a day
+    return identical data like a real OpenCost would for a closed day.
+
+    Parameters:
+    - namespaces (int): Number of namespaces.
+    - pods (int): Pods per namespace.
+    - start, end (datetime): Window of the set.
+    - cluster (str): Cluster name in the allocation properties.
+    - aggregate (str): Comma separated properties to aggregate by, e.g. 'namespace' merges the pods of a
+      namespace into one entry; entries are named like OpenCost's, e.g. 'namespace/pod'.
+    - seed (int): Random seed of the synthetic usage.
+
+    Returns:
+    - Dict of allocation name -> allocation.
+    """
+    rng = random.Random(f"{seed}/{cluster}/{start:%Y-%m-%dT%H}")
+    hours = (end - start).total_seconds() / 3600
+    properties = aggregate.split(",")
+    entries = {}
+    for namespace in namespace_names(namespaces):
+        for pod in pod_names(namespace, pods):
+            allocation = _allocation(rng, cluster, namespace, pod, start, end, hours)
+            _merge(entries, "/".join(allocation["properties"][name] for name in properties), allocation)
+    entries["__idle__"] = _idle(cluster, start, end, hours)
+    return entries
+
+
+def _merge(entries, name, allocation):
+    merged = entries.get(name)
+    if merged is None:
+        entries[name] = dict(allocation, name=name)
+        return
+    cpu_cost = merged["cpuCost"] + allocation["cpuCost"]
+    ram_cost = merged["ramCost"] + allocation["ramCost"]
+    merged["cpuEfficiency"] = (
+        merged["cpuEfficiency"] * merged["cpuCost"] + allocation["cpuEfficiency"] * allocation["cpuCost"]
+    ) / cpu_cost
+    merged["ramEfficiency"] = (
+        merged["ramEfficiency"] * merged["ramCost"] + allocation["ramEfficiency"] * allocation["ramCost"]
+    ) / ram_cost
+    merged["totalEfficiency"] = (merged["cpuEfficiency"] * cpu_cost + merged["ramEfficiency"] * ram_cost) / (
+        cpu_cost + ram_cost
+    )
+    merged["cpuCost"], merged["ramCost"] = cpu_cost, ram_cost
+    merged["totalCost"] = cpu_cost + ram_cost
+
+
+def parse_window(window, now=None):
+    """
+    Parses an OpenCost window, either relative ('7d', '24h') or absolute ('start,end' in RFC 3339).
+
+    Relative windows end now and are aligned like OpenCost's: whole days start at midnight UTC.
+
+    Returns:
+    - Tuple of (start, end) datetimes in UTC.
+    """
+    now = now or datetime.now(timezone.utc)
+    if "," in window:
+        start, end = (datetime.fromisoformat(part.replace("Z", "+00:00")) for part in window.split(","))
+        return start, end
+    amount, unit = int(window[:-1]), window[-1]
+    if unit == "d":
+        end = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        return end - timedelta(days=amount), end
+    if unit == "h":
+        end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        return end - timedelta(hours=amount), end
+    raise ValueError(f"Unsupported window {window!r}")
+
+
+def response_body(namespaces, pods, window, aggregate="namespace,pod", accumulate=False, cluster="cluster-one",
+                  seed=0):
+    """
+    Builds a complete /model/allocation/compute response body.
+
+    Non-accumulated responses hold one allocation set per day of the window (step=1d), sub-day windows a
+    single set; accumulated responses merge every day into one set.
+
+    Returns:
+    - JSON body as bytes.
+    """
+    start, end = parse_window(window)
+    sets = []
+    day = start
+    while day < end:
+        day_end = min(end, day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1))
+        sets.append(allocation_set(namespaces, pods, day, day_end, cluster, aggregate, seed))
+        day = day_end
+    if accumulate and sets:
+        sets = [_accumulate(sets)]
+    return json.dumps({"code": 200, "status": "success", "data": sets}).encode()
+
+
+def _accumulate(sets):
+    accumulated = {}
+    for allocation_set in sets:
+        for name, allocation in allocation_set.items():
+            if name not in accumulated:
+                accumulated[name] = dict(allocation)
+            elif "namespace" in allocation["properties"]:
+                _merge(accumulated, name, allocation)
+            else:
+                for field in ("cpuCost", "ramCost", "totalCost"):
+                    accumulated[name][field] += allocation[field]
+    return accumulated
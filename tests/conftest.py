@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tool and the benchmark stand-ins are imported from the repository root, like benchmarks/run.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,99 @@
+import os
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from tools.costs import cache
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+@pytest.fixture
+def allocation_cache(tmp_path):
+    return cache.AllocationCache(str(tmp_path))
+
+
+def columns(values):
+    return {field: np.asarray(values, dtype=np.float64) for field in cache.COLUMNS}
+
+
+def store(allocation_cache, day, written, names=("default",)):
+    allocation_cache.put_day("cluster", "namespace", day, np.array(names, dtype=str), columns([1.0] * len(names)))
+    path = allocation_cache._path("cluster", "namespace", day)
+    os.utime(path, (written, written))
+    return path
+
+
+def test_bucket_written_while_the_day_was_open_is_refreshed_after_midnight(allocation_cache):
+    yesterday = cache.utc_today() - timedelta(days=1)
+    # Written in the middle of yesterday, read now: still a partial day
+    store(allocation_cache, yesterday, yesterday.timestamp() + 12 * HOUR)
+    assert allocation_cache.get_day("cluster", "namespace", yesterday) is None
+
+
+def test_bucket_written_within_the_close_grace_is_not_final(allocation_cache):
+    day = cache.utc_today() - timedelta(days=3)
+    store(allocation_cache, day, day.timestamp() + DAY + cache.DEFAULT_CLOSE_GRACE / 2)
+    assert allocation_cache.get_day("cluster", "namespace", day) is None
+
+
+def test_bucket_written_after_the_day_closed_is_kept(allocation_cache):
+    day = cache.utc_today() - timedelta(days=3)
+    store(allocation_cache, day, day.timestamp() + DAY + cache.DEFAULT_CLOSE_GRACE + HOUR)
+    names, _ = allocation_cache.get_day("cluster", "namespace", day)
+    assert list(names) == ["default"]
+
+
+def test_open_day_is_served_within_its_ttl(allocation_cache):
+    today = cache.utc_today()
+    allocation_cache.put_day("cluster", "namespace", today, np.array(["default"]), columns([1.0]))
+    assert allocation_cache.get_day("cluster", "namespace", today) is not None
+
+
+def test_is_closed_waits_for_the_grace_period(allocation_cache):
+    day = cache.utc_today() - timedelta(days=5)
+    end = day.timestamp() + DAY
+    assert not allocation_cache.is_closed(day, now=end)
+    assert allocation_cache.is_closed(day, now=end + cache.DEFAULT_CLOSE_GRACE)
+    assert not allocation_cache.is_closed(day, empty=True, now=end + cache.DEFAULT_CLOSE_GRACE)
+    assert allocation_cache.is_closed(day, empty=True, now=end + cache.DEFAULT_CLOSE_GRACE + cache.EMPTY_DAY_GRACE)
+
+
+def test_recent_empty_day_is_not_cached(allocation_cache):
+    yesterday = cache.utc_today() - timedelta(days=1)
+    allocation_cache.put_day("cluster", "namespace", yesterday, np.array([], dtype=str), columns([]))
+    assert not os.path.exists(allocation_cache._path("cluster", "namespace", yesterday))
+
+
+def test_settled_empty_day_is_cached(allocation_cache):
+    day = cache.utc_today() - timedelta(days=5)
+    allocation_cache.put_day("cluster", "namespace", day, np.array([], dtype=str), columns([]))
+    names, _ = allocation_cache.get_day("cluster", "namespace", day)
+    assert len(names) == 0
+
+
+def test_evict_only_removes_day_buckets(tmp_path):
+    allocation_cache = cache.AllocationCache(str(tmp_path), max_bytes=0)
+    day = cache.utc_today() - timedelta(days=5)
+    bucket = store(allocation_cache, day, day.timestamp() + 2 * DAY)
+    other = tmp_path / "trends" / "series.npz"
+    other.parent.mkdir()
+    other.write_bytes(b"series")
+
+    allocation_cache.evict()
+
+    assert not os.path.exists(bucket)
+    assert other.exists()
+
+
+def test_merge_days_weights_efficiencies_by_cost():
+    first = (np.array(["a"]), {**columns([0.0]), "cpuEfficiency": np.array([0.2]), "cpuCost": np.array([1.0]),
+                               "totalCost": np.array([1.0])})
+    second = (np.array(["a"]), {**columns([0.0]), "cpuEfficiency": np.array([0.8]), "cpuCost": np.array([3.0]),
+                                "totalCost": np.array([3.0])})
+    names, merged = cache.merge_days([first, second])
+    assert list(names) == ["a"]
+    assert merged["totalCost"][0] == pytest.approx(4.0)
+    assert merged["cpuEfficiency"][0] == pytest.approx(0.65)
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+import requests
+
+from tools.costs import cache, chunked
+
+DAY = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def piece(name, cost):
+    return np.array([name]), {field: np.array([cost]) for field in cache.COLUMNS}
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+
+def test_days_are_fetched_as_separate_pieces():
+    windows = []
+
+    def fetch_window(start, end, timeout, stats):
+        windows.append((start, end))
+        return [piece("default", 1.0)]
+
+    days = chunked.AdaptiveFetcher(fetch_window, backoff=0).fetch([(DAY, DAY + timedelta(days=3))])
+
+    assert sorted(windows) == [(DAY + timedelta(days=n), DAY + timedelta(days=n + 1)) for n in range(3)]
+    assert list(days) == [DAY + timedelta(days=n) for n in range(3)]
+
+
+def test_timed_out_day_is_split_and_merged_back():
+    def fetch_window(start, end, timeout, stats):
+        if end - start > timedelta(hours=12):
+            raise requests.exceptions.Timeout()
+        return [piece("default", 1.0)]
+
+    days = chunked.AdaptiveFetcher(fetch_window, backoff=0).fetch([(DAY, DAY + timedelta(days=1))])
+
+    names, columns = days[DAY]
+    assert list(names) == ["default"]
+    assert columns["totalCost"][0] == pytest.approx(2.0)
+
+
+def test_http_errors_are_not_retried():
+    calls = []
+
+    def fetch_window(start, end, timeout, stats):
+        calls.append(start)
+        raise http_error(404)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        chunked.AdaptiveFetcher(fetch_window, backoff=0).fetch([(DAY, DAY + timedelta(days=1))])
+    assert len(calls) == 1
+
+
+def test_body_cut_off_mid_read_is_retried():
+    calls = []
+
+    def fetch_window(start, end, timeout, stats):
+        calls.append(start)
+        if len(calls) < 3:
+            raise requests.exceptions.ChunkedEncodingError("connection broken")
+        return [piece("default", 1.0)]
+
+    days = chunked.AdaptiveFetcher(fetch_window, backoff=0).fetch([(DAY, DAY + timedelta(days=1))])
+    assert len(calls) == 3
+    assert list(days[DAY][0]) == ["default"]
@@ -0,0 +1,41 @@
+import pytest
+
+from tools.costs import main
+
+
+def test_unknown_subcommand_is_rejected(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main.main(["qurey"])
+    assert exit_info.value.code == 2
+    assert "invalid choice" in capsys.readouterr().err
+
+
+def test_unknown_option_is_rejected(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main.main(["query", "--bogus"])
+    assert exit_info.value.code == 2
+    assert "unrecognized arguments" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("argv", [[], ["--window", "30d"]])
+def test_options_without_a_subcommand_run_the_report(monkeypatch, argv):
+    calls = []
+    monkeypatch.setitem(main.COMMANDS, "report", calls.append)
+    main.main(argv)
+    assert [args.command for args in calls] == ["report"]
+    assert calls[0].window == ("30d" if argv else "7d")
+
+
+@pytest.mark.parametrize("argv, message", [
+    (["query", "--window", "7"], "--window: Unsupported window '7'"),
+    (["regressions", "--trend-window", "month"], "--trend-window: Unsupported window 'month'"),
+    (["query", "--endpoints", "c=http://opencost:9090", "--levels", "namespace,pod"], "must start with 'cluster'"),
+    (["query", "--levels", "namespace,namespace"], "repeats a level"),
+    (["query", "--subtree", "prod"], "--subtree needs --levels"),
+    (["query", "--levels", "namespace,pod", "--subtree", "payments/api"], "must be above the last of --levels"),
+])
+def test_unusable_fetching_options_are_rejected(capsys, argv, message):
+    with pytest.raises(SystemExit) as exit_info:
+        main.main(argv)
+    assert exit_info.value.code == 2
+    assert message in capsys.readouterr().err
@@ -0,0 +1,129 @@
+import json
+import time
+import urllib.request
+
+import pytest
+import slack_sdk
+
+from benchmarks.fake_slack import FakeSlack
+from tools.costs import delivery
+
+
+@pytest.fixture
+def slack():
+    server = FakeSlack(channels=["C1", "C2"]).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(server):
+    return slack_sdk.WebClient(token="test", base_url=server.api_url)
+
+
+def uploads(server):
+    with urllib.request.urlopen(server.api_url.replace("/api/", "/uploads")) as response:
+        return json.load(response)["uploads"]
+
+
+def test_artifact_is_uploaded_once_for_every_channel(slack, tmp_path):
+    state = delivery.PostState(str(tmp_path / "posts.json"))
+    with delivery.SlackDelivery(client(slack), state=state) as slack_delivery:
+        slack_delivery.submit(delivery.Artifact("treemap.png", b"png"), ["C1", "C2"], "Daily costs")
+
+    assert slack_delivery.results == {("C1", "treemap.png"): "posted", ("C2", "treemap.png"): "posted"}
+    assert [upload["channels"] for upload in uploads(slack)] == [["C1", "C2"]]
+    assert uploads(slack)[0]["sha256"] == delivery.Artifact("treemap.png", b"png").digest
+
+
+def test_unchanged_artifact_is_skipped_on_the_next_run(slack, tmp_path):
+    path = str(tmp_path / "posts.json")
+    with delivery.SlackDelivery(client(slack), state=delivery.PostState(path)) as slack_delivery:
+        slack_delivery.submit(delivery.Artifact("treemap.png", b"png"), ["C1"])
+
+    with delivery.SlackDelivery(client(slack), state=delivery.PostState(path)) as slack_delivery:
+        skipped = slack_delivery.submit(delivery.Artifact("treemap.png", b"png"), ["C1"])
+        slack_delivery.submit(delivery.Artifact("treemap.png", b"changed"), ["C2"])
+
+    assert skipped == ["C1"]
+    assert slack_delivery.results[("C1", "treemap.png")] == "skipped"
+    assert len(uploads(slack)) == 2
+
+
+def test_unknown_channel_does_not_block_the_others(slack, tmp_path):
+    state = delivery.PostState(str(tmp_path / "posts.json"))
+    with delivery.SlackDelivery(client(slack), state=state) as slack_delivery:
+        slack_delivery.submit(delivery.Artifact("treemap.png", b"png"), ["C1", "NOPE"])
+
+    assert slack_delivery.failures() == {("NOPE", "treemap.png"): "channel_not_found"}
+    assert slack_delivery.results[("C1", "treemap.png")] == "posted"
+
+
+def test_rate_limited_upload_is_retried_after_retry_after(tmp_path):
+    server = FakeSlack(rate_limit=1).start()
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        time.sleep(seconds)
+
+    try:
+        state = delivery.PostState(str(tmp_path / "posts.json"))
+        with delivery.SlackDelivery(client(server), max_workers=1, state=state, sleep=sleep) as slack_delivery:
+            slack_delivery.submit(delivery.Artifact("a.png", b"a"), ["C1"])
+            slack_delivery.submit(delivery.Artifact("b.png", b"b"), ["C1"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert not slack_delivery.failures()
+    assert waits and all(seconds == 1.0 for seconds in waits)
+
+
+class FlakyClient:
+    """
+    Stand-in client answering files_upload_v2 with the given errors, then ok.
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def files_upload_v2(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            return {"ok": False, "error": self.errors.pop(0)}
+        return {"ok": True}
+
+
+def test_transient_errors_are_retried_with_backoff():
+    waits = []
+    flaky = FlakyClient("internal_error", "service_unavailable")
+    with delivery.SlackDelivery(flaky, state=delivery.PostState(None), backoff=0.5, sleep=waits.append) as slack_delivery:
+        slack_delivery.submit(delivery.Artifact("a.png", b"a"), ["C1"])
+
+    assert slack_delivery.results == {("C1", "a.png"): "posted"}
+    assert flaky.calls == 3
+    assert waits == [0.5, 1.0]
+
+
+def test_permanent_errors_are_not_retried():
+    flaky = FlakyClient("invalid_auth")
+    with delivery.SlackDelivery(flaky, state=delivery.PostState(None), sleep=lambda seconds: None) as slack_delivery:
+        slack_delivery.submit(delivery.Artifact("a.png", b"a"), ["C1"])
+
+    assert slack_delivery.failures() == {("C1", "a.png"): "invalid_auth"}
+    assert flaky.calls == 1
+
+
+def test_concurrent_post_states_keep_each_others_posts(tmp_path):
+    path = str(tmp_path / "posts.json")
+    first, second = delivery.PostState(path), delivery.PostState(path)
+    first.mark_posted(["C1"], delivery.Artifact("a.png", b"a"))
+    second.mark_posted(["C2"], delivery.Artifact("a.png", b"a"))
+    first.save()
+    second.save()
+
+    reloaded = delivery.PostState(path)
+    assert reloaded.is_posted("C1", delivery.Artifact("a.png", b"a"))
+    assert reloaded.is_posted("C2", delivery.Artifact("a.png", b"a"))
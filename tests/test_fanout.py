@@ -0,0 +1,67 @@
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from benchmarks.fake_opencost import FakeOpenCost
+from tools.costs import fanout
+from tools.costs import main as report
+
+
+@pytest.fixture
+def opencost():
+    server = FakeOpenCost(5, 3).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def unreachable():
+    # A port that was just free, nothing listens on it
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def test_unreachable_cluster_does_not_fail_the_others(opencost, capsys):
+    endpoints = {"up": opencost.endpoint("cluster-one"), "down": unreachable()}
+    ranked = report.query_clusters(endpoints, window="1d", timeout="5s", use_cache=False,
+                                   session=fanout.make_session(retries=0))
+
+    assert set(ranked["cluster"]) == {"up"}
+    assert len(ranked) == 5
+    assert "Failed to query cluster down" in capsys.readouterr().out
+
+
+def test_all_clusters_failing_is_an_error():
+    with pytest.raises(requests.exceptions.RequestException, match="All clusters failed"):
+        report.query_clusters({"down": unreachable()}, window="1d", timeout="5s", use_cache=False,
+                              session=fanout.make_session(retries=0))
+
+
+def test_clusters_past_the_deadline_are_abandoned():
+    release = threading.Event()
+
+    def fetch(url, session, timeout):
+        if url == "slow":
+            release.wait(10)
+        return url
+
+    started = time.monotonic()
+    results, errors = fanout.fan_out({"fast": "fast", "slow": "slow"}, fetch, timeout=5.0, session=object(),
+                                     deadline=0.2)
+    elapsed = time.monotonic() - started
+    abandoned = [thread for thread in threading.enumerate() if thread.name.startswith("opencost")]
+    release.set()
+
+    assert results == {"fast": "fast"}
+    assert errors == {"slow": "timed out after 0.2s"}
+    assert elapsed < 2
+    assert abandoned and all(thread.daemon for thread in abandoned)
+
+
+def test_default_deadline_covers_every_batch_of_clusters():
+    endpoints = {f"c{index}": "" for index in range(40)}
+    assert fanout.fan_out_deadline(endpoints, timeout=30.0, max_workers=16, requests_per_endpoint=2) == 30.0 * 2 * 3
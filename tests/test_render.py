@@ -0,0 +1,67 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.costs import render
+
+
+@pytest.mark.parametrize("values", [[6, 6, 4, 3, 2, 2, 1], [100, 1, 1, 1], [5], list(range(40, 0, -1))])
+def test_squarify_fills_the_rectangle_in_proportion_to_the_values(values):
+    x, y, width, height = 10.0, 20.0, 600.0, 400.0
+    rects = render.squarify(values, x, y, width, height)
+
+    areas = np.array([w * h for _, _, w, h in rects])
+    np.testing.assert_allclose(areas / (width * height), np.array(values) / sum(values))
+    for rx, ry, w, h in rects:
+        assert rx >= x - 1e-9 and ry >= y - 1e-9
+        assert rx + w <= x + width + 1e-9 and ry + h <= y + height + 1e-9
+    for (ax, ay, aw, ah), (bx, by, bw, bh) in itertools.combinations(rects, 2):
+        overlap = max(0.0, min(ax + aw, bx + bw) - max(ax, bx)) * max(0.0, min(ay + ah, by + bh) - max(ay, by))
+        assert overlap < 1e-6
+
+
+def test_squarify_keeps_rectangles_close_to_square():
+    rects = render.squarify([1] * 16, 0, 0, 400, 400)
+    assert max(max(w / h, h / w) for _, _, w, h in rects) < 1.5
+
+
+def test_squarify_without_anything_to_lay_out():
+    assert render.squarify([], 0, 0, 10, 10) == []
+    assert render.squarify([0, 0], 0, 0, 10, 10) == [(0, 0, 0.0, 0.0)] * 2
+
+
+def test_render_cache_renders_the_same_data_once(tmp_path):
+    renders = []
+    frame = pd.DataFrame({"namespace": ["a", "b"], "totalCost": [2.0, 1.0]})
+
+    def rendered(data):
+        return lambda: renders.append(data) or data
+
+    first = render.RenderCache(str(tmp_path))
+    path = first.get_or_render(render.digest(frame, "treemap", "svg"), "svg", rendered(b"<svg/>"))
+    # A new cache over the same directory, as in the next run
+    again = render.RenderCache(str(tmp_path)).get_or_render(
+        render.digest(frame.copy(), "treemap", "svg"), "svg", rendered(b"other")
+    )
+
+    assert again == path
+    assert renders == [b"<svg/>"]
+    with open(path, "rb") as f:
+        assert f.read() == b"<svg/>"
+
+
+def test_render_cache_key_changes_with_the_data_and_options():
+    frame = pd.DataFrame({"namespace": ["a", "b"], "totalCost": [2.0, 1.0]})
+    changed = frame.assign(totalCost=[2.0, 1.5])
+    assert render.digest(frame, "treemap", "svg") != render.digest(changed, "treemap", "svg")
+    assert render.digest(frame, "treemap", "svg") != render.digest(frame, "treemap", "matplotlib")
+
+
+def test_render_cache_evicts_the_oldest_images(tmp_path):
+    cache = render.RenderCache(str(tmp_path), max_bytes=25)
+    paths = [cache.get_or_render(f"key-{index}", "png", lambda: b"x" * 10) for index in range(3)]
+    remaining = sorted(path.name for path in tmp_path.iterdir())
+    assert len(remaining) == 2
+    assert paths[-1].endswith(remaining[-1])
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.costs import rollup
+
+LEVELS = ["cluster", "namespace", "pod"]
+
+
+@pytest.fixture
+def leaves():
+    rng = np.random.default_rng(0)
+    count = 200
+    frame = pd.DataFrame({
+        "cluster": rng.choice(["prod", "staging"], count),
+        "namespace": rng.choice(["payments", "search", "web"], count),
+        "pod": [f"pod-{index % 17}" for index in range(count)],
+        "cpuCost": rng.uniform(0, 5, count),
+        "ramCost": rng.uniform(0, 3, count),
+        "cpuEfficiency": rng.uniform(0, 1, count),
+        "ramEfficiency": rng.uniform(0, 1, count),
+        "totalEfficiency": rng.uniform(0, 1, count),
+    })
+    frame.loc[:4, ["cpuCost", "ramCost"]] = 0.0  # nodes without cost get an efficiency of 0
+    frame["totalCost"] = frame["cpuCost"] + frame["ramCost"] + rng.uniform(0, 1, count)
+    return frame
+
+
+def plain_groupby(leaves, levels):
+    frame = leaves.assign(
+        cpuWeighted=leaves["cpuEfficiency"] * leaves["cpuCost"],
+        ramWeighted=leaves["ramEfficiency"] * leaves["ramCost"],
+        totalWeighted=leaves["totalEfficiency"] * (leaves["cpuCost"] + leaves["ramCost"]),
+    )
+    sums = frame.groupby(levels)[["cpuCost", "ramCost", "totalCost", "cpuWeighted", "ramWeighted", "totalWeighted"]].sum()
+
+    def efficiency(weighted, cost):
+        return np.where(cost > 0, weighted / cost.where(cost > 0, 1), 0.0)
+
+    return pd.DataFrame({
+        "cpuEfficiency": efficiency(sums["cpuWeighted"], sums["cpuCost"]),
+        "ramEfficiency": efficiency(sums["ramWeighted"], sums["ramCost"]),
+        "totalEfficiency": efficiency(sums["totalWeighted"], sums["cpuCost"] + sums["ramCost"]),
+        "cpuCost": sums["cpuCost"],
+        "ramCost": sums["ramCost"],
+        "totalCost": sums["totalCost"],
+    }, index=sums.index)
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3])
+def test_every_level_matches_a_plain_cost_weighted_groupby(leaves, depth):
+    index = rollup.RollupIndex(leaves, LEVELS)
+    levels = LEVELS[:depth]
+    expected = plain_groupby(leaves, levels)
+
+    nodes = index.level(depth).astype({level: str for level in levels}).set_index(levels).sort_index()
+    pd.testing.assert_frame_equal(nodes[expected.columns], expected.sort_index(), check_names=False)
+    assert list(index.level(depth)["totalCost"]) == sorted(expected["totalCost"], reverse=True)
+
+
+def test_view_of_a_subtree_drops_its_ancestors(leaves):
+    index = rollup.RollupIndex(leaves, LEVELS)
+    frame, path = index.view(("prod", "payments"))
+
+    expected = plain_groupby(leaves[(leaves["cluster"] == "prod") & (leaves["namespace"] == "payments")], ["pod"])
+    assert path == ["pod"]
+    assert list(frame.columns[:1]) == ["pod"]
+    assert "cluster" not in frame and "namespace" not in frame
+    assert list(frame["pod"].astype(str)) == list(expected.sort_values("totalCost", ascending=False).index)
+    np.testing.assert_allclose(frame["cpuEfficiency"], expected.loc[frame["pod"].astype(str), "cpuEfficiency"])
+
+
+def test_view_of_the_root_keeps_every_level(leaves):
+    index = rollup.RollupIndex(leaves, LEVELS)
+    frame, path = index.view(depth="namespace")
+    assert path == ["cluster", "namespace"]
+    assert len(frame) == len(plain_groupby(leaves, ["cluster", "namespace"]))
+
+
+def test_from_frame_splits_names_and_marks_missing_parts():
+    frame = pd.DataFrame({
+        "namespace": ["prod/payments/api-1", "prod/__idle__"],
+        **{metric: [1.0, 2.0] for metric in rollup.cost_frame.METRICS},
+    })
+    index = rollup.RollupIndex.from_frame(frame, LEVELS)
+    assert index.node(("prod", "__idle__", rollup.UNALLOCATED))["totalCost"] == 2.0
+    assert index.node(("prod",))["totalCost"] == 3.0
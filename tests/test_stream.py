@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from tools.costs import cache, stream
+
+BODY = {
+    "code": 200,
+    "status": "success",
+    "data": [
+        {
+            "default": {"properties": {"namespace": "default"}, "cpuEfficiency": 0.25, "totalCost": 1.5},
+            "__idle__": {"properties": {}, "totalCost": 9.0},
+        },
+        {
+            "kube-system": {"properties": {"namespace": "kube-system"}, "totalCost": 2.0, "name": "a \"quoted\" {name}"},
+        },
+    ],
+}
+
+
+def chunks(body, size):
+    data = json.dumps(body).encode()
+    return [data[offset:offset + size] for offset in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, stream.CHUNK_SIZE])
+def test_parses_whatever_the_chunk_boundaries(size):
+    sets = stream.accumulate_sets(stream.iter_allocations(chunks(BODY, size)), cache.COLUMNS)
+
+    assert len(sets) == 2
+    names, columns = sets[0].columns()
+    assert list(names) == ["default"]  # allocations without a namespace are dropped
+    assert columns["cpuEfficiency"][0] == 0.25
+    assert columns["totalCost"][0] == 1.5
+    assert columns["ramCost"][0] == 0.0
+    assert list(sets[1].columns()[0]) == ["kube-system"]
+
+
+def test_failed_query_raises():
+    with pytest.raises(Exception, match="Query failed"):
+        list(stream.iter_allocations(chunks({"code": 500, "status": "error", "data": []}, 16)))
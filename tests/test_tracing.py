@@ -0,0 +1,80 @@
+import re
+
+import pytest
+
+from tools.costs import tracing
+
+NAME = r"[a-zA-Z_:][a-zA-Z0-9_:]*"
+LABEL_VALUE = r'"(?:[^"\\\n]|\\\\|\\"|\\n)*"'
+SAMPLE = re.compile(rf"({NAME})(?:\{{({NAME}={LABEL_VALUE}(?:,{NAME}={LABEL_VALUE})*)?\}})? (\S+)")
+
+
+def parse_exposition(text):
+    """
+    Parses the Prometheus text format strictly enough to catch malformed output.
+
+    Returns:
+    - Dict of metric name -> {'type', 'help', 'samples': [(labels, value)]}.
+    """
+    assert text.endswith("\n")
+    metrics = {}
+    for line in text[:-1].split("\n"):
+        if line.startswith("# HELP "):
+            name, _, help_text = line[len("# HELP "):].partition(" ")
+            assert re.fullmatch(NAME, name) and help_text
+            assert "help" not in metrics.setdefault(name, {"samples": []}), f"second HELP for {name}"
+            metrics[name]["help"] = help_text
+        elif line.startswith("# TYPE "):
+            name, kind = line[len("# TYPE "):].split(" ")
+            assert kind in ("counter", "gauge")
+            metric = metrics.setdefault(name, {"samples": []})
+            assert "type" not in metric and not metric["samples"], f"TYPE for {name} after its samples"
+            metric["type"] = kind
+        else:
+            match = SAMPLE.fullmatch(line)
+            assert match, f"malformed sample line {line!r}"
+            name, labels, value = match.groups()
+            assert "type" in metrics.get(name, {}), f"sample of {name} without a TYPE"
+            metrics[name]["samples"].append((labels, float(value)))
+    return metrics
+
+
+def test_prometheus_exposition_is_valid():
+    tracer = tracing.Tracer(enabled=True)
+    for stage in ("fetch", "decode", 'odd "stage"\\name\n'):
+        with tracer.span(stage) as span:
+            span.add(bytes=10, rows=2)
+    with pytest.raises(RuntimeError):
+        with tracer.span("fetch"):
+            raise RuntimeError("boom")
+
+    metrics = parse_exposition(tracer.prometheus())
+
+    calls = dict(metrics["costs_stage_calls_total"]["samples"])
+    assert calls['stage="fetch"'] == 2
+    assert calls['stage="odd \\"stage\\"\\\\name\\n"'] == 1
+    assert dict(metrics["costs_stage_errors_total"]["samples"])['stage="fetch"'] == 1
+    assert dict(metrics["costs_stage_bytes_total"]["samples"])['stage="decode"'] == 10
+    assert metrics["costs_stage_wall_seconds_total"]["type"] == "counter"
+    assert metrics["costs_stage_last_wall_seconds"]["type"] == "gauge"
+    assert metrics["costs_peak_rss_bytes"]["samples"][0][1] > 0
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = tracing.Tracer()
+    with tracer.span("fetch") as span:
+        span.add(bytes=10)
+        span.set(read_seconds=1.0)
+    assert tracer.summary() == {}
+    assert "costs_stage_calls_total{" not in tracer.prometheus()
+
+
+def test_write_prometheus_replaces_the_file(tmp_path):
+    tracer = tracing.Tracer(enabled=True)
+    with tracer.span("fetch"):
+        pass
+    path = tmp_path / "costs.prom"
+    tracer.write_prometheus(str(path))
+    tracer.write_prometheus(str(path))
+    parse_exposition(path.read_text())
+    assert [p.name for p in tmp_path.iterdir()] == ["costs.prom"]
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from tools.costs import cache, trend
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def day_columns(values):
+    return {metric: np.asarray(values[metric], dtype=np.float64) for metric in cache.COLUMNS}
+
+
+def build(history):
+    """
+    Builds a series from [{name: {metric: value}}] per day.
+    """
+    series = trend.TrendSeries()
+    for offset, day in enumerate(history):
+        names = list(day)
+        series.append_day(
+            START + timedelta(days=offset),
+            names,
+            {metric: [day[name].get(metric, 0.0) for name in names] for metric in cache.COLUMNS},
+        )
+    return series
+
+
+def random_history(days=30, namespaces=6, seed=0):
+    rng = np.random.default_rng(seed)
+    history = []
+    for offset in range(days):
+        day = {}
+        for index in range(namespaces):
+            # ns-1 only appears on day 10 and ns-2 skips every fifth day
+            if (index == 1 and offset < 10) or (index == 2 and offset % 5 == 0):
+                continue
+            day[f"ns-{index}"] = {
+                metric: rng.uniform(0.2, 0.8) if "Efficiency" in metric else rng.uniform(10, 12)
+                for metric in cache.COLUMNS
+            }
+        history.append(day)
+    return history
+
+
+def test_baselines_match_a_plain_computation():
+    history = random_history()
+    series = build(history)
+    last = len(history) - 1
+
+    for name in ("ns-0", "ns-1", "ns-2"):
+        row = series._rows[name]
+        first = min(offset for offset, day in enumerate(history) if name in day)
+        window = range(max(last - 14, first), last)
+        # Costs count the days a namespace was missing (after it appeared) as 0
+        costs = [history[offset].get(name, {}).get("totalCost", 0.0) for offset in window]
+        mean, std, days = series.baseline("totalCost", 14)
+        assert mean[row] == pytest.approx(np.mean(costs))
+        assert std[row] == pytest.approx(np.std(costs))
+        assert days[row] == len(costs)
+        # Efficiencies only average the days it was present
+        efficiencies = [history[offset][name]["cpuEfficiency"] for offset in window if name in history[offset]]
+        mean, std, _ = series.baseline("cpuEfficiency", 14)
+        assert mean[row] == pytest.approx(np.mean(efficiencies))
+        assert std[row] == pytest.approx(np.std(efficiencies))
+
+
+def test_baseline_of_every_day_at_once_matches_one_day_at_a_time():
+    series = build(random_history())
+    all_days, _, _ = series.baseline("totalCost", 7, at=np.arange(len(series.days)))
+    for offset in (3, 15, 29):
+        one_day, _, _ = series.baseline("totalCost", 7, at=offset)
+        np.testing.assert_allclose(all_days[:, offset], one_day)
+
+
+def test_days_already_in_the_series_are_ignored_and_gaps_rejected():
+    series = build(random_history(days=3))
+    assert not series.append_day(START, [], day_columns({metric: [] for metric in cache.COLUMNS}))
+    with pytest.raises(ValueError):
+        series.append_day(START + timedelta(days=5), [], day_columns({metric: [] for metric in cache.COLUMNS}))
+
+
+def test_saved_series_matches_one_rebuilt_from_its_days(tmp_path):
+    history = random_history()
+    path = str(tmp_path / "series.npz")
+    build(history).save(path, keep=20)
+
+    loaded = trend.TrendSeries.load(path)
+    rebuilt = build(history[-20:])
+    assert loaded.days == [START + timedelta(days=offset) for offset in range(10, 30)]
+    order = [rebuilt._rows[name] for name in loaded.names]
+    for metric in cache.COLUMNS:
+        np.testing.assert_allclose(loaded.zscores(metric), rebuilt.zscores(metric)[order])
+
+
+def test_regressions_rank_cost_spikes_and_efficiency_drops_by_impact():
+    history = [
+        {name: {"totalCost": 10.0 + offset % 2, "cpuCost": 5.0, "cpuEfficiency": 0.5, "ramEfficiency": 0.5}
+         for name in ("steady", "spike", "idle")}
+        for offset in range(15)
+    ]
+    history[-1]["spike"]["totalCost"] = 30.0
+    history[-1]["idle"]["cpuEfficiency"] = 0.1
+
+    report = build(history).regressions(days=14, threshold=3.0)
+
+    assert list(report["namespace"]) == ["spike", "idle"]
+    assert list(report["kind"]) == ["cost", "cpuEfficiency"]
+    assert report["impact"].iloc[0] == pytest.approx(30.0 - 10.5, rel=0.01)
+    assert report["impact"].iloc[1] == pytest.approx((0.5 - 0.1) * 5.0)
+    formatted = trend.format_regressions(report)
+    assert formatted.loc["idle", "cpuEfficiency"] == "10.00%"
+    assert formatted.loc["idle", "ramEfficiency"] == "50.00%"
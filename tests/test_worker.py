@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from tools.costs import worker
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(report):
+        server = worker.make_server(report, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_report_options_round_trip_through_the_worker(serve):
+    received = []
+
+    def report(session=None, **options):
+        received.append(options)
+        return {"default": {"totalCost": "$1.00"}}
+
+    url = serve(report)
+    result = worker.request_report(url, renderer="svg", window="7d", timeout="30s", channels="C1,C2")
+
+    assert result == {"default": {"totalCost": "$1.00"}}
+    assert received == [{"renderer": "svg", "window": "7d", "timeout": "30s", "channels": "C1,C2"}]
+
+
+def test_failed_report_is_an_error(serve):
+    url = serve(lambda session=None, **options: None)
+    with pytest.raises(RuntimeError, match="502"):
+        worker.request_report(url, window="7d")
+
+
+def test_concurrent_identical_requests_share_one_report(serve):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def report(session=None, **options):
+        calls.append(options)
+        started.set()
+        release.wait(5)
+        return {"calls": len(calls)}
+
+    url = serve(report)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(worker.request_report(url, window="7d"))) for _ in range(4)
+    ]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{"calls": 1}] * 4
+
+
+def test_coalescer_does_not_cache_failures():
+    coalescer = worker.Coalescer()
+    with pytest.raises(ValueError):
+        coalescer.run("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert coalescer.run("key", lambda: 42) == (42, False)
+    assert coalescer.run("key", lambda: 43) == (42, True)
+
+
+def test_coalescer_does_not_cache_failed_reports():
+    coalescer = worker.Coalescer()
+    assert coalescer.run("key", lambda: None) == (None, False)
+    assert coalescer.run("key", lambda: 42) == (42, False)
+
+
+def test_reports_for_other_channels_share_the_fetch(monkeypatch):
+    from tools.costs import main
+
+    ranks, delivered = [], []
+    monkeypatch.setattr(main, "rank_report", lambda *args: ranks.append(args) or ("ranked", None, "Namespaces"))
+    monkeypatch.setattr(main, "prettier_data", lambda ranked: {"ranked": ranked})
+    monkeypatch.setattr(main, "generate_treemap", lambda *args, **kwargs: delivered.append(kwargs) or True)
+
+    rankings = worker.Coalescer()
+    for renderer, channels in [("svg", "C1"), ("matplotlib", "C2"), ("svg", "C1")]:
+        assert main.run_report(renderer, channels=channels, rankings=rankings, window="7d") == {"ranked": "ranked"}
+    main.run_report("svg", channels="C1", rankings=rankings, window="14d")
+
+    assert [args[1] for args in ranks] == ["7d", "14d"]
+    assert [(kwargs["renderer"], kwargs["channels"]) for kwargs in delivered] == [
+        ("svg", ["C1"]), ("matplotlib", ["C2"]), ("svg", ["C1"]), ("svg", ["C1"])
+    ]
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "COSTS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "costs-optimizations")
+)
+DEFAULT_TTL = 90 * 24 * 3600  # closed days never change, keep them for a quarter
+DEFAULT_OPEN_DAY_TTL = 15 * 60  # today's bucket is still filling up
+DEFAULT_CLOSE_GRACE = 2 * 3600  # OpenCost's ETL may still be filling in a day after midnight
+EMPTY_DAY_GRACE = 24 * 3600  # a day without data is only trusted a day later still
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+DAY_FILE = re.compile(r"\d{4}-\d{2}-\d{2}\.npz")
+
+# Costs are kept next to the efficiencies so that several days can be merged with cost weighting
+COLUMNS = ["cpuEfficiency", "ramEfficiency", "totalEfficiency", "cpuCost", "ramCost", "totalCost"]
+
+
+def utc_today():
+    return datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def window_days(window, today=None):
+    """
+    Expands a relative window such as '7d' into the UTC day buckets it covers.
+
+    Parameters:
+    - window (str): Relative window in days, e.g. '7d' or '30d'.
+    - today (datetime): Start of the current (still open) day, defaults to today in UTC.
+
+    Returns:
+    - List of day start datetimes, oldest first, ending with today.
+    """
+    match = re.fullmatch(r"(\d+)d", window.strip())
+    if not match:
+        raise ValueError(f"Unsupported window {window!r}, expected something like '7d'")
+    today = today or utc_today()
+    count = int(match.group(1))
+    return [today - timedelta(days=offset) for offset in range(count - 1, -1, -1)]
+
+
+def missing_ranges(days):
+    """
+    Groups consecutive days into [start, end) ranges so each gap is fetched with one request.
+    """
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [tuple(r) for r in ranges]
+
+
+def weighted_efficiencies(cpu_cost, ram_cost, cpu_weighted, ram_weighted, total_weighted):
+    """
+    Turns summed costs and summed cost-weighted efficiencies back into efficiencies.
+
+    CPU and RAM efficiencies are weighted by their own cost and the total efficiency by the combined CPU and
+    RAM cost, matching how OpenCost accumulates allocations. Groups without cost get an efficiency of 0.
+
+    Returns:
+    - Dict with cpuEfficiency, ramEfficiency and totalEfficiency float64 arrays.
+    """
+    cpu_cost, ram_cost = np.asarray(cpu_cost, dtype=np.float64), np.asarray(ram_cost, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        efficiencies = {
+            "cpuEfficiency": np.asarray(cpu_weighted) / cpu_cost,
+            "ramEfficiency": np.asarray(ram_weighted) / ram_cost,
+            "totalEfficiency": np.asarray(total_weighted) / (cpu_cost + ram_cost),
+        }
+    return {field: np.nan_to_num(values) for field, values in efficiencies.items()}
+
+
+def merge_days(day_frames):
+    """
+    Merges several per-day column sets into one accumulated column set.
+
+    Costs are summed and efficiencies are cost weighted, see weighted_efficiencies.
+
+    Parameters:
+    - day_frames: Iterable of (names, columns) tuples as returned by AllocationCache.get_day.
+
+    Returns:
+    - Tuple of (unique names, {column: float64 array}) with one row per name.
+    """
+    day_frames = [frame for frame in day_frames if len(frame[0])]
+    if not day_frames:
+        return np.array([], dtype=str), {field: np.zeros(0) for field in COLUMNS}
+
+    all_names = np.concatenate([names for names, _ in day_frames])
+    unique, inverse = np.unique(all_names, return_inverse=True)
+
+    def column(field):
+        return np.concatenate([columns[field] for _, columns in day_frames])
+
+    def summed(values):
+        return np.bincount(inverse, weights=values, minlength=len(unique))
+
+    cpu_cost, ram_cost = column("cpuCost"), column("ramCost")
+    merged = {field: summed(column(field)) for field in ("cpuCost", "ramCost", "totalCost")}
+    merged.update(weighted_efficiencies(
+        merged["cpuCost"],
+        merged["ramCost"],
+        summed(column("cpuEfficiency") * cpu_cost),
+        summed(column("ramEfficiency") * ram_cost),
+        summed(column("totalEfficiency") * (cpu_cost + ram_cost)),
+    ))
+    return unique, merged
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:  # already evicted by a concurrent run
+        pass
+
+
+def atomic_write(path, write, binary=True):
+    """
+    Writes a file through a uniquely named temporary file and a rename.
+
+    Readers never see a half written file, and concurrent writers of the same path, threads of one worker
+    included, each get their own temporary file; the last rename wins.
+
+    Parameters:
+    - path (str): File to write, its directory is created if needed.
+    - write (callable): write(f) fills the open temporary file.
+    - binary (bool): Open the temporary file in binary mode.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if binary else "w") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+
+
+class AllocationCache:
+    """
+    Columnar on-disk cache of per-day allocation records.
+
+    Every (cluster, day window, aggregate) bucket is stored as one .npz file holding the allocation
+    names and a float64 array per metric. Buckets written once their day was closed live for `ttl`
+    seconds; buckets written while it was still open (including today's) are refreshed after
+    `open_day_ttl` seconds, even once the day is over. The least recently used buckets are dropped once
+    the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, open_day_ttl=DEFAULT_OPEN_DAY_TTL,
+                 max_bytes=DEFAULT_MAX_BYTES, close_grace=DEFAULT_CLOSE_GRACE):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.open_day_ttl = open_day_ttl
+        self.max_bytes = max_bytes
+        self.close_grace = close_grace
+
+    def _path(self, cluster, aggregate, day):
+        key = hashlib.sha1(f"{cluster}|{aggregate}".encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, key, f"{day:%Y-%m-%d}.npz")
+
+    def is_closed(self, day, empty=False, now=None):
+        """
+        Returns whether OpenCost is done with a day: it ended `close_grace` seconds before `now`, or
+        EMPTY_DAY_GRACE seconds more for a day without data.
+        """
+        now = time.time() if now is None else now
+        grace = self.close_grace + (EMPTY_DAY_GRACE if empty else 0)
+        return now >= (day + timedelta(days=1)).timestamp() + grace
+
+    def _max_age(self, day, written):
+        # Whether the day was closed when the bucket was written, not today, decides if it is final
+        return self.ttl if self.is_closed(day, now=written) else self.open_day_ttl
+
+    def get_day(self, cluster, aggregate, day):
+        """
+        Returns the cached (names, columns) for a day, or None if it is missing or expired.
+        """
+        path = self._path(cluster, aggregate, day)
+        try:
+            written = os.path.getmtime(path)
+            if time.time() - written > self._max_age(day, written):
+                return None
+            with np.load(path, allow_pickle=False) as stored:
+                names = stored["names"]
+                columns = {field: stored[field] for field in COLUMNS}
+        except (OSError, KeyError, ValueError):
+            return None
+        os.utime(path, (time.time(), os.path.getmtime(path)))  # atime drives LRU eviction
+        return names, columns
+
+    def put_day(self, cluster, aggregate, day, names, columns):
+        """
+        Stores the names and metric columns of one day, replacing any previous version atomically.
+
+        A day without data is not stored until it is closed for good, OpenCost may just not have it yet.
+        """
+        if not len(names) and not self.is_closed(day, empty=True):
+            return names, columns
+        atomic_write(self._path(cluster, aggregate, day), lambda f: np.savez(f, names=names, **columns))
+        return names, columns
+
+    def evict(self):
+        """
+        Removes expired buckets, then the least recently used ones until the cache fits in max_bytes.
+        """
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                # Only day buckets; other caches (renders, trends) share the directory
+                if not DAY_FILE.fullmatch(name):
+                    continue
+                if now - stat.st_mtime > self.ttl:
+                    _remove(path)
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
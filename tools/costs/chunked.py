@@ -0,0 +1,161 @@
+import math
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import requests
+from urllib3.exceptions import MaxRetryError
+
+try:
+    from . import cache
+except ImportError:  # running as a script next to the shipped modules
+    import cache
+
+DEFAULT_CHUNK = timedelta(days=1)
+MIN_CHUNK = timedelta(hours=1)
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # seconds, doubled on every retry
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # responses above this shrink the following chunks
+
+
+def _day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _retryable(error):
+    """
+    Returns whether a failed sub-request is worth retrying here.
+
+    The session already retries failed connections and 429/5xx answers (see fanout.make_session), and other
+    HTTP errors will not change on a retry; what is left is a body cut off while it was being read.
+    """
+    if isinstance(error, requests.exceptions.ChunkedEncodingError):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return not (error.args and isinstance(error.args[0], MaxRetryError))
+    return False
+
+
+def max_rounds(days, max_workers=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES):
+    """
+    Returns how many sequential sub-request timeouts fetching `days` days can take in the worst case.
+
+    That is one round per batch of parallel days, plus one per halving of a timed-out day down to MIN_CHUNK,
+    plus the retries of the smallest pieces.
+    """
+    splits = math.ceil(math.log2(DEFAULT_CHUNK / MIN_CHUNK))
+    return math.ceil(days / max_workers) + splits + retries
+
+
+class AdaptiveFetcher:
+    """
+    Fetches a long window as many small sub-windows in parallel and accumulates them per day.
+
+    Sub-windows start at one day. When a sub-request times out it is split in half and retried; when one
+    is slow or its body is large, the chunk size of the following sub-requests is halved, down to
+    `min_chunk`. Sub-windows never cross midnight, so every piece belongs to exactly one day bucket.
+    Timeouts of the smallest pieces and bodies cut off mid-read are retried with backoff; connection
+    failures and throttled answers are left to the session's own retries.
+    """
+
+    def __init__(self, fetch_window, max_workers=DEFAULT_MAX_WORKERS, timeout=30.0, slow_after=None,
+                 max_bytes=DEFAULT_MAX_BYTES, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 chunk=DEFAULT_CHUNK, min_chunk=MIN_CHUNK):
+        """
+        Parameters:
+        - fetch_window (callable): fetch_window(start, end, timeout, stats) -> list of (names, columns) sets,
+          filling stats['bytes'] with the response size.
+        - max_workers (int): Sub-requests in flight at once.
+        - timeout (float): Timeout in seconds of every sub-request.
+        - slow_after (float): Sub-requests slower than this shrink the chunk size, defaults to half the timeout.
+        - max_bytes (int): Responses larger than this shrink the chunk size.
+        - retries (int): Retries of a sub-request that timed out and cannot be split any further, or whose
+          body was cut off.
+        - backoff (float): Delay before the first retry, doubled on every further retry.
+        - chunk (timedelta): Initial sub-window size.
+        - min_chunk (timedelta): Smallest sub-window size.
+        """
+        self.fetch_window = fetch_window
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.slow_after = slow_after if slow_after is not None else (timeout or 30.0) / 2
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk = chunk
+        self.min_chunk = min_chunk
+
+    def _shrink(self):
+        self.chunk = max(self.chunk / 2, self.min_chunk)
+
+    def _fetch(self, start, end, delay):
+        if delay:
+            time.sleep(delay)
+        stats = {}
+        started = time.perf_counter()
+        sets = self.fetch_window(start, end, self.timeout, stats)
+        return sets, time.perf_counter() - started, stats.get("bytes", 0)
+
+    def _next_piece(self, pending):
+        start, end, attempt = pending.popleft()
+        piece_end = min(end, start + self.chunk, _day(start) + timedelta(days=1))
+        if piece_end < end:
+            pending.appendleft((piece_end, end, 0))
+        return start, piece_end, attempt
+
+    def fetch(self, ranges):
+        """
+        Fetches every [start, end) range and accumulates the pieces per day.
+
+        Parameters:
+        - ranges: Iterable of (start, end) datetimes, e.g. from cache.missing_ranges.
+
+        Returns:
+        - Dict of day start -> (names, columns) for every day in the ranges; days without data are empty.
+        """
+        pieces = {}
+        pending = deque((start, end, 0) for start, end in ranges)
+        for start, end, _ in pending:
+            day = _day(start)
+            while day < end:
+                pieces[day] = []
+                day += timedelta(days=1)
+
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="opencost-chunk") as executor:
+            while pending or in_flight:
+                while pending and len(in_flight) < self.max_workers:
+                    start, end, attempt = self._next_piece(pending)
+                    delay = self.backoff * 2 ** (attempt - 1) if attempt else 0
+                    in_flight[executor.submit(self._fetch, start, end, delay)] = (start, end, attempt)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, end, attempt = in_flight.pop(future)
+                    try:
+                        sets, elapsed, size = future.result()
+                    except requests.exceptions.Timeout:
+                        if end - start > self.min_chunk:
+                            # Too slow as a whole: retry as two halves with a smaller chunk size
+                            self._shrink()
+                            middle = start + max((end - start) / 2, self.min_chunk)
+                            pending.appendleft((middle, end, 0))
+                            pending.appendleft((start, middle, 0))
+                            continue
+                        if attempt >= self.retries:
+                            raise
+                        pending.append((start, end, attempt + 1))
+                        continue
+                    except requests.exceptions.RequestException as e:
+                        if not _retryable(e) or attempt >= self.retries:
+                            raise
+                        pending.append((start, end, attempt + 1))
+                        continue
+
+                    if elapsed > self.slow_after or size > self.max_bytes:
+                        self._shrink()
+                    pieces[_day(start)].extend(sets)
+
+        return {day: cache.merge_days(day_sets) for day, day_sets in pieces.items()}
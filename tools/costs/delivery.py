@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+try:
+    from . import cache
+except ImportError:  # running as a script next to the shipped modules
+    import cache
+
+DEFAULT_STATE_PATH = os.path.join(cache.DEFAULT_CACHE_DIR, "slack-posts.json")
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_QUEUE = 32  # submit() blocks once this many uploads are waiting
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0  # seconds, doubled on every retry unless Slack asks for a Retry-After
+SHARE_BATCH = 20  # channels shared in a single upload
+
+# Slack errors worth retrying; anything else (e.g. channel_not_found) fails the channel right away
+RETRYABLE_ERRORS = {
+    "ratelimited", "internal_error", "fatal_error", "service_unavailable", "request_timeout", "connection_error",
+}
+
+
+class Artifact:
+    """
+    A rendered report file kept in memory, identified by the hash of its content.
+    """
+
+    def __init__(self, filename, data, title=None):
+        self.filename = filename
+        self.data = data
+        self.title = title or filename
+        self.digest = hashlib.sha256(data).hexdigest()
+
+    @classmethod
+    def from_path(cls, path, filename=None, title=None):
+        with open(path, "rb") as f:
+            return cls(filename or os.path.basename(path), f.read(), title)
+
+
+class PostState:
+    """
+    Content hash of the last artifact posted to each channel, persisted across runs.
+
+    Saving merges this run's posts into the file as it is then, so concurrent reports (e.g. threads of the
+    worker, each with its own PostState) keep each other's posts.
+    """
+
+    _save_lock = threading.Lock()  # serializes the read-merge-write of every PostState in the process
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._posts = self._read()
+        self._posted = {}
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, TypeError, ValueError):
+            return {}
+
+    @staticmethod
+    def _key(channel, filename):
+        # Different artifacts (the treemap, the table) are tracked separately in the same channel
+        return f"{channel}/{filename}"
+
+    def is_posted(self, channel, artifact):
+        with self._lock:
+            return self._posts.get(self._key(channel, artifact.filename)) == artifact.digest
+
+    def mark_posted(self, channels, artifact):
+        with self._lock:
+            for channel in channels:
+                self._posts[self._key(channel, artifact.filename)] = artifact.digest
+                self._posted[self._key(channel, artifact.filename)] = artifact.digest
+
+    def save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            posts = self._read()
+            with self._lock:
+                posts.update(self._posted)
+                self._posts = posts
+            cache.atomic_write(self.path, lambda f: json.dump(posts, f), binary=False)
+
+
+def _slack_error(error):
+    """
+    Returns (Slack error code, Retry-After seconds or None) of an exception raised by a Slack client call.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        # Connection errors and timeouts carry no Slack response and are transient; anything else is a bug
+        return ("connection_error" if isinstance(error, OSError) else f"{type(error).__name__}: {error}"), None
+    status = getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("Retry-After") or headers.get("retry-after")
+    code = response.get("error") if hasattr(response, "get") else None
+    if status == 429:
+        code = "ratelimited"
+    elif status is not None and status >= 500:
+        code = code or "service_unavailable"
+    return code or "unknown_error", float(retry_after) if retry_after else None
+
+
+class SlackDelivery:
+    """
+    Delivers report artifacts to Slack channels through a bounded queue of concurrent uploads.
+
+    Each artifact is uploaded once and shared to all of its channels in the same call. Channels whose last
+    post of that artifact had the same content are skipped. Rate limits are retried after Slack's
+    Retry-After delay, other transient failures with exponential backoff. If a shared upload fails for a
+    permanent reason (e.g. one channel does not exist), every channel is retried on its own, so one bad
+    channel does not block the others.
+
+    Use as a context manager, or call close() to wait for every delivery:
+
+        with SlackDelivery(client) as slack:
+            slack.submit(Artifact("treemap.png", png), ["C123", "C456"], "Daily costs")
+        print(slack.results)
+    """
+
+    def __init__(self, client, max_workers=DEFAULT_MAX_WORKERS, max_queue=DEFAULT_MAX_QUEUE, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, state=None, sleep=time.sleep):
+        """
+        Parameters:
+        - client: Slack WebClient (or anything with the same files_upload_v2 method).
+        - max_workers (int): Uploads running at the same time.
+        - max_queue (int): Uploads waiting before submit() blocks.
+        - retries (int): Retries of a failed upload.
+        - backoff (float): Delay before the first retry, doubled on every further retry.
+        - state (PostState): Last posted content per channel, defaults to the one in COSTS_CACHE_DIR.
+        - sleep (callable): Used to wait between retries.
+        """
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+        self.state = state if state is not None else PostState()
+        self.sleep = sleep
+        self.results = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"slack-delivery-{index}", daemon=True)
+            for index in range(max_workers)
+        ]
+        for thread in self._workers:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def submit(self, artifact, channels, comment=None):
+        """
+        Queues an artifact for the given channels; returns without waiting for the upload.
+
+        Returns:
+        - List of channels that were skipped because they already show this content.
+        """
+        skipped, targets = [], []
+        for channel in dict.fromkeys(channels):
+            (skipped if self.state.is_posted(channel, artifact) else targets).append(channel)
+        for channel in skipped:
+            self._result(channel, artifact, "skipped")
+        for start in range(0, len(targets), SHARE_BATCH):
+            self._queue.put((artifact, targets[start:start + SHARE_BATCH], comment))
+        return skipped
+
+    def close(self):
+        """
+        Waits for every queued upload, stops the workers and saves the posted content hashes.
+
+        Returns:
+        - Dict of (channel, filename) -> 'posted', 'skipped' or the error of the failed upload.
+        """
+        self._queue.join()
+        for _ in self._workers:
+            self._queue.put(None)
+        for thread in self._workers:
+            thread.join()
+        self.state.save()
+        return self.results
+
+    def failures(self):
+        """
+        Returns {(channel, filename): error} of the uploads that failed.
+        """
+        return {key: status for key, status in self.results.items() if status not in ("posted", "skipped")}
+
+    def _result(self, channel, artifact, status):
+        with self._lock:
+            self.results[(channel, artifact.filename)] = status
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._deliver(*job)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, artifact, channels, comment):
+        attempt = 0
+        while True:
+            try:
+                response = self.client.files_upload_v2(
+                    channels=channels,
+                    file=artifact.data,
+                    filename=artifact.filename,
+                    title=artifact.title,
+                    initial_comment=comment,
+                )
+                error = None if response["ok"] else response.get("error", "unknown_error")
+                retry_after = None
+            except Exception as e:
+                error, retry_after = _slack_error(e)
+
+            if error is None:
+                self.state.mark_posted(channels, artifact)
+                for channel in channels:
+                    self._result(channel, artifact, "posted")
+                return
+            if error in RETRYABLE_ERRORS and attempt < self.retries:
+                self.sleep(retry_after if retry_after is not None else self.backoff * 2 ** attempt)
+                attempt += 1
+                continue
+            if len(channels) > 1 and error not in RETRYABLE_ERRORS:
+                # Find out which channel is at fault, the others still get the file
+                for channel in channels:
+                    self._deliver(artifact, [channel], comment)
+                return
+            for channel in channels:
+                self._result(channel, artifact, error)
+            return
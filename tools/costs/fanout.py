@@ -0,0 +1,136 @@
+import queue
+import threading
+from concurrent.futures import Future, wait
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_RETRIES = 3
+
+
+def parse_endpoints(spec):
+    """
+    Parses a comma separated list of OpenCost endpoints.
+
+    Every entry is either a bare base URL or `cluster=url`; bare URLs are named after their host.
+
+    Parameters:
+    - spec (str): e.g. 'prod=http://opencost.prod:9090,http://opencost.staging:9090'
+
+    Returns:
+    - Dict of cluster name -> base URL, in the given order.
+    """
+    endpoints = {}
+    for entry in (spec or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, url = entry.partition("=")
+        if not sep:
+            name, url = urlparse(entry).hostname or entry, entry
+        endpoints[name.strip()] = url.strip().rstrip("/")
+    return endpoints
+
+
+def make_session(pool_size=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES, hosts=DEFAULT_MAX_WORKERS):
+    """
+    Returns a requests session that keeps up to `pool_size` keep-alive connections to each of `hosts` hosts.
+
+    Failed connections and throttled or unavailable responses (429, 5xx) are retried with exponential
+    backoff; read timeouts are not, callers split or retry those themselves.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=False,
+        status=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fan_out_deadline(endpoints, timeout=30.0, max_workers=DEFAULT_MAX_WORKERS, requests_per_endpoint=1):
+    """
+    Returns the seconds fan_out waits by default: every batch of `max_workers` clusters may make
+    `requests_per_endpoint` sequential rounds of requests, each taking up to `timeout`.
+    """
+    batches = -(-len(endpoints) // max(min(max_workers, len(endpoints)), 1))
+    return timeout * requests_per_endpoint * batches
+
+
+def fan_out(endpoints, fetch, timeout=30.0, max_workers=DEFAULT_MAX_WORKERS, session=None, requests_per_endpoint=1,
+            connections_per_endpoint=1, deadline=None):
+    """
+    Runs `fetch` against every endpoint concurrently on a bounded pool of threads.
+
+    A failing or slow cluster never fails the whole run: its error is reported and the other clusters are
+    still returned. Each request gets `timeout` seconds and the whole fan-out `deadline` seconds; clusters
+    still running then are reported as timed out and abandoned. Their threads are daemons, so they do not
+    hold up the exit of the process.
+
+    Parameters:
+    - endpoints (dict): Cluster name -> OpenCost base URL.
+    - fetch (callable): fetch(base_url, session, timeout) -> result of the cluster, e.g. a cost frame.
+    - timeout (float): Timeout in seconds of each request `fetch` makes.
+    - max_workers (int): Maximum number of clusters queried at the same time.
+    - session (requests.Session): Shared pooled session, created if not given.
+    - requests_per_endpoint (int): Sequential rounds of requests `fetch` makes, each allowed `timeout`.
+    - connections_per_endpoint (int): Concurrent requests `fetch` makes, sizes the pool of a created session.
+    - deadline (float): Seconds to wait for all clusters (default is fan_out_deadline).
+
+    Returns:
+    - Tuple of ({cluster: result}, {cluster: error message}).
+    """
+    if not endpoints:
+        return {}, {}
+
+    workers = min(max_workers, len(endpoints))
+    session = session or make_session(connections_per_endpoint, hosts=workers)
+    if deadline is None:
+        deadline = fan_out_deadline(endpoints, timeout, max_workers, requests_per_endpoint)
+    results, errors = {}, {}
+
+    futures = {cluster: Future() for cluster in endpoints}
+    pending = queue.SimpleQueue()
+    for cluster, url in endpoints.items():
+        pending.put((cluster, url))
+
+    def work():
+        while True:
+            try:
+                cluster, url = pending.get_nowait()
+            except queue.Empty:
+                return
+            future = futures[cluster]
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fetch(url, session, timeout))
+            except BaseException as e:
+                future.set_exception(e)
+
+    for index in range(workers):
+        threading.Thread(target=work, name=f"opencost-{index}", daemon=True).start()
+    done, not_done = wait(futures.values(), timeout=deadline)
+    for cluster, future in futures.items():
+        if future in done:
+            try:
+                results[cluster] = future.result()
+            except Exception as e:
+                errors[cluster] = str(e)
+        else:
+            future.cancel()  # not started yet: the workers skip it
+            errors[cluster] = f"timed out after {deadline:g}s"
+
+    return results, errors
+
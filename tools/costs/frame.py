@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from . import cache
+except ImportError:  # running as a script next to the shipped modules
+    import cache
+
+# A cost frame is a DataFrame with a categorical `namespace` column, an optional categorical `cluster` column and
+# one float64 column per metric. Efficiencies are ratios (0.25 is 25%) and costs are dollars; values only become
+# strings in format_frame, right before rendering.
+METRICS = cache.COLUMNS
+EFFICIENCIES = ["cpuEfficiency", "ramEfficiency", "totalEfficiency"]
+
+
+def from_columns(names, columns, cluster=None):
+    """
+    Builds a cost frame from an array of allocation names and one array per metric.
+
+    Parameters:
+    - names: Sequence of namespace (allocation) names.
+    - columns (dict): Metric -> array-like of floats aligned with names; missing metrics are zero.
+    - cluster (str): Optional cluster name added as a categorical column.
+
+    Returns:
+    - Cost frame.
+    """
+    size = len(names)
+    frame = pd.DataFrame({
+        "namespace": pd.Categorical(np.asarray(names, dtype=str)),
+        **{
+            metric: np.asarray(columns.get(metric, np.zeros(size)), dtype=np.float64)
+            for metric in METRICS
+        },
+    })
+    if cluster is not None:
+        frame.insert(0, "cluster", pd.Categorical([cluster] * size))
+    return frame
+
+
+def concat(frames):
+    """
+    Concatenates per-cluster cost frames into one frame with a categorical cluster dimension.
+
+    Parameters:
+    - frames (dict): Cluster name -> cost frame.
+    """
+    if not frames:
+        return from_columns([], {}, cluster="")
+    columns = ["cluster", "namespace", *METRICS]
+    merged = pd.concat(
+        [frame.assign(cluster=cluster)[columns] for cluster, frame in frames.items()], ignore_index=True
+    )
+    # pd.concat falls back to object dtype when the categories differ
+    merged["cluster"] = merged["cluster"].astype("category")
+    merged["namespace"] = merged["namespace"].astype("category")
+    return merged
+
+
+def rank(frame, by="totalCost", limit=None):
+    """
+    Sorts a cost frame by a metric, highest first, optionally keeping only the top `limit` rows.
+    """
+    if limit is not None and limit < len(frame):
+        return frame.nlargest(limit, by)
+    return frame.sort_values(by, ascending=False, kind="stable", ignore_index=True)
+
+
+def labels(frame):
+    """
+    Returns the row labels used by the reports, the non-metric columns joined with '/'.
+
+    That is 'namespace' for a single cluster, 'cluster/namespace' with a cluster dimension, and the node path
+    for roll-up levels.
+    """
+    dimensions = [column for column in frame.columns if column not in METRICS]
+    names = frame[dimensions[0]].astype(str).to_numpy()
+    for dimension in dimensions[1:]:
+        names = np.char.add(np.char.add(names, "/"), frame[dimension].astype(str).to_numpy())
+    return names
+
+
+def format_percent(values):
+    return np.char.add(np.char.mod("%.2f", np.asarray(values, dtype=np.float64)), "%")
+
+
+def format_cost(values):
+    return np.char.add("$", np.char.mod("%.2f", np.asarray(values, dtype=np.float64)))
+
+
+def format_frame(frame):
+    """
+    Renders the metrics of a cost frame as display strings ("4.40%", "$1.55"), indexed by row label.
+    """
+    formatted = pd.DataFrame(
+        {column: format_percent(frame[column].to_numpy() * 100) for column in EFFICIENCIES},
+        index=labels(frame),
+    )
+    formatted["totalCost"] = format_cost(frame["totalCost"].to_numpy())
+    if "cluster" in frame:
+        formatted["cluster"] = frame["cluster"].astype(str).to_numpy()
+    return formatted
@@ -1,37 +1,263 @@
 import argparse
+import functools
+import importlib
+import json
+import os
+import shutil
 import sys
-import matplotlib.pyplot as plt
+import time
+
+_STARTED = time.perf_counter()
+
+OPENCOST_URL = "http://opencost.opencost:9090"
+RENDERERS = ["plotly", "matplotlib", "svg"]
+SLACK_CHANNEL = "D05T1HF3MNZ"
+SLACK_API_URL = os.getenv("SLACK_API_URL", "https://slack.com/api/")
+SLACK_COMMENT = "Here is the detailed stats of the namespaces."
+REGRESSIONS_COMMENT = "Namespaces whose cost or efficiency regressed yesterday."
+
+# Seconds spent importing each lazily loaded module, reported with --import-times
+IMPORT_TIMES = {}
+
+
+class _LazyModule:
+    """
+    Imports a module on first attribute access, so each subcommand only pays for the libraries it uses.
+
+    Sibling modules are imported from this package, or from the script directory when main.py is shipped
+    on its own into a tool container.
+    """
+
+    def __init__(self, name, sibling=False):
+        self._name = name
+        self._sibling = sibling
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            name = f"{__package__}.{self._name}" if self._sibling and __package__ else self._name
+            start = time.perf_counter()
+            self._module = importlib.import_module(name)
+            IMPORT_TIMES[self._name] = time.perf_counter() - start
+        return getattr(self._module, attr)
+
+
+requests = _LazyModule("requests")
+pd = _LazyModule("pandas")
+px = _LazyModule("plotly.express")
+slack_sdk = _LazyModule("slack_sdk")
+
+cache = _LazyModule("cache", sibling=True)
+chunked = _LazyModule("chunked", sibling=True)
+cost_frame = _LazyModule("frame", sibling=True)
+delivery = _LazyModule("delivery", sibling=True)
+fanout = _LazyModule("fanout", sibling=True)
+render = _LazyModule("render", sibling=True)
+rollup = _LazyModule("rollup", sibling=True)
+stream_parser = _LazyModule("stream", sibling=True)
+tracing = _LazyModule("tracing", sibling=True)
+trend = _LazyModule("trend", sibling=True)
+worker = _LazyModule("worker", sibling=True)
 
-import requests
-import pandas as pd
-import slack_sdk
-import os
-import plotly.express as px
-import numpy as np
 
 def hello_world(name: str):
     print(f"Hello, {name}!")
 
 
-def filter_namespace_data(data):
+def _metered(chunks, stats, deadline=None):
     """
-    Filters the input data for all namespaces found in the structure and retains specified fields.
+    Passes body chunks through, counting their bytes and enforcing an overall deadline.
+
+    requests' own timeout only bounds the wait for each read, so a server trickling bytes could keep a
+    request alive forever; the deadline turns that into a Timeout like any other slow request.
+    """
+    chunks = iter(chunks)
+    while True:
+        # Time spent waiting on the network, as opposed to parsing, is reported in the trace
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        stats['read_seconds'] = stats.get('read_seconds', 0.0) + time.perf_counter() - started
+        if chunk is None:
+            return
+        stats['bytes'] = stats.get('bytes', 0) + len(chunk)
+        if deadline is not None and time.monotonic() > deadline:
+            raise requests.exceptions.Timeout(f"Response not read within the timeout ({stats['bytes']} bytes)")
+        yield chunk
+
+
+def fetch_allocation_sets(cost_metrics_url, params, session=None, timeout=None, stream=True, stats=None):
+    """
+    Fetches OpenCost allocations and keeps only the cost metrics of namespaced allocations.
+
+    In streaming mode the body is read incrementally and every allocation is reduced to its metrics as soon
+    as it is parsed, so memory stays flat however many pods or containers the response holds.
 
     Parameters:
-    - data: The input data containing metrics for various namespaces.
-    - fields: List of fields to keep in the output.
+    - cost_metrics_url (str): OpenCost allocation endpoint.
+    - params (dict): Query parameters of the allocation request.
+    - session (requests.Session): Pooled session to reuse connections, defaults to a one-off request.
+    - timeout (float): Timeout in seconds of the whole request, body included.
+    - stream (bool): Parse the body incrementally instead of loading it with response.json() (default is True).
+    - stats (dict): Filled with the response size under 'bytes' if given.
 
     Returns:
-    - JSON structure with the filtered data.
+    - List of stream.ColumnAccumulator, one per allocation set.
     """
-    # fields = ["cpuEfficiency", "ramEfficiency", "totalEfficiency", "cpuCost", "ramCost", "totalCost"]
-    fields = ["cpuEfficiency", "ramEfficiency", "totalEfficiency", "totalCost"]
+    stats = stats if stats is not None else {}
+    deadline = time.monotonic() + timeout if timeout else None
+    with tracing.span('opencost_request', url=cost_metrics_url, window=params.get('window'), stream=stream):
+        response = (session or requests).get(cost_metrics_url, params=params, timeout=timeout, stream=stream)
+    with response, tracing.span('decode', url=cost_metrics_url, stream=stream) as decode:
+        response.raise_for_status()
+        if stream:
+            chunks = _metered(response.iter_content(stream_parser.CHUNK_SIZE), stats, deadline)
+            allocations = stream_parser.iter_allocations(chunks)
+        else:
+            stats['bytes'] = len(response.content)
+            data = response.json()
+            if data['status'] != 'success':
+                raise Exception(f"Query failed with status: {data['status']}")
+            allocations = (
+                (index, name, allocation)
+                for index, allocation_set in enumerate(data['data'] or [])
+                for name, allocation in (allocation_set or {}).items()
+            )
+        sets = stream_parser.accumulate_sets(allocations, cache.COLUMNS)
+        decode.set(read_seconds=stats.get('read_seconds', 0.0))
+        decode.add(bytes=stats.get('bytes', 0), rows=sum(len(allocation_set.names) for allocation_set in sets))
+        return sets
+
+
+def fetch_allocation_window(cost_metrics_url, start, end, aggregate='namespace', session=None, timeout=None,
+                            stream=True, stats=None):
+    """
+    Fetches the allocations of one sub-window of at most a day as a single allocation set.
 
-    result = {
-        namespace: {field: metrics.get(field) for field in fields}
-        for namespace, metrics in data[0].items() if metrics.get("properties", {}).get("namespace")
+    Parameters:
+    - cost_metrics_url (str): OpenCost allocation endpoint.
+    - start (datetime): Start of the sub-window.
+    - end (datetime): End of the sub-window, exclusive and no later than the next UTC midnight.
+    - aggregate (str): OpenCost aggregation, e.g. 'namespace'.
+    - session (requests.Session): Pooled session to reuse connections, defaults to a one-off request.
+    - timeout (float): Timeout in seconds of the whole request.
+    - stream (bool): Parse the response incrementally, see fetch_allocation_sets.
+    - stats (dict): Filled with the response size, see fetch_allocation_sets.
+
+    Returns:
+    - List of (names, columns) per allocation set; empty if OpenCost has no data for the sub-window.
+    """
+    params = {
+        'window': f"{start:%Y-%m-%dT%H:%M:%SZ},{end:%Y-%m-%dT%H:%M:%SZ}",
+        'aggregate': aggregate,
+        'includeIdle': 'true',
+        'step': '1d',
+        'accumulate': 'false',
     }
-    return result
+    sets = fetch_allocation_sets(cost_metrics_url, params, session, timeout, stream, stats)
+    return [allocation_set.columns() for allocation_set in sets]
+
+
+def fetch_days(cost_metrics_url, days, aggregate='namespace', session=None, timeout=None, stream=True):
+    """
+    Fetches the allocations of each day from OpenCost as parallel per-day (or smaller, see
+    chunked.AdaptiveFetcher) requests.
+
+    Parameters:
+    - cost_metrics_url (str): OpenCost allocation endpoint.
+    - days (list): UTC day starts, see cache.window_days.
+    - aggregate (str): OpenCost aggregation, e.g. 'namespace'.
+    - session (requests.Session): Pooled session, created if not given.
+    - timeout (float): Timeout in seconds of each OpenCost sub-request.
+    - stream (bool): Parse responses incrementally, see fetch_allocation_sets.
+
+    Returns:
+    - Dict of day -> (names, columns) for every day; days without data are empty.
+    """
+    session = session or fanout.make_session(chunked.DEFAULT_MAX_WORKERS)
+    fetcher = chunked.AdaptiveFetcher(
+        lambda start, end, seconds, stats: fetch_allocation_window(
+            cost_metrics_url, start, end, aggregate, session, seconds, stream, stats
+        ),
+        timeout=timeout,
+    )
+    with tracing.span('fetch', url=cost_metrics_url, days=len(days)):
+        return fetcher.fetch(cache.missing_ranges(days))
+
+
+def cached_days(cost_metrics_url, days, aggregate='namespace', allocation_cache=None, session=None, timeout=None,
+                stream=True):
+    """
+    Returns the allocations of each day, fetching only the days missing from the cache.
+
+    Closed days are served from the on-disk cache; missing days and the still open current day are fetched
+    from OpenCost as parallel per-day (or smaller, see chunked.AdaptiveFetcher) requests and cached.
+
+    Parameters:
+    - cost_metrics_url (str): OpenCost allocation endpoint, also used as the cluster key of the cache.
+    - days (list): UTC day starts, see cache.window_days.
+    - aggregate (str): OpenCost aggregation, e.g. 'namespace'.
+    - allocation_cache (AllocationCache): Cache to use, defaults to the one in COSTS_CACHE_DIR.
+    - session (requests.Session): Pooled session used for the missing days, created if not given.
+    - timeout (float): Timeout in seconds of each OpenCost sub-request.
+    - stream (bool): Parse responses incrementally, see fetch_allocation_sets.
+
+    Returns:
+    - Dict of day -> (names, columns) for every day, oldest first; days without data are empty.
+    """
+    allocation_cache = allocation_cache or cache.AllocationCache()
+
+    frames = {}
+    missing = []
+    with tracing.span('cache_load', url=cost_metrics_url, days=len(days)) as load:
+        for day in days:
+            cached = allocation_cache.get_day(cost_metrics_url, aggregate, day)
+            if cached is None:
+                missing.append(day)
+            else:
+                frames[day] = cached
+                load.add(rows=len(cached[0]))
+
+    if missing:
+        fetched = fetch_days(cost_metrics_url, missing, aggregate, session, timeout, stream)
+        with tracing.span('cache_store', url=cost_metrics_url) as store:
+            for day, (names, columns) in fetched.items():
+                frames[day] = allocation_cache.put_day(cost_metrics_url, aggregate, day, names, columns)
+                store.add(rows=len(names))
+
+    allocation_cache.evict()
+    return dict(sorted(frames.items()))
+
+
+def cached_namespace_data(cost_metrics_url, window='7d', aggregate='namespace', allocation_cache=None, session=None,
+                          timeout=None, stream=True):
+    """
+    Returns the accumulated allocation records for a window, fetching only the days missing from the cache.
+
+    Parameters:
+    - cost_metrics_url (str): OpenCost allocation endpoint, also used as the cluster key of the cache.
+    - window (str): Relative window in days, e.g. '7d' or '30d'.
+    - aggregate (str): OpenCost aggregation, e.g. 'namespace'.
+    - allocation_cache (AllocationCache): Cache to use, defaults to the one in COSTS_CACHE_DIR.
+    - session (requests.Session): Pooled session used for the missing days, created if not given.
+    - timeout (float): Timeout in seconds of each OpenCost sub-request.
+    - stream (bool): Parse responses incrementally, see fetch_allocation_sets.
+
+    Returns:
+    - Cost frame with one row per namespace.
+    """
+    frames = cached_days(cost_metrics_url, cache.window_days(window), aggregate, allocation_cache, session, timeout,
+                         stream)
+    return accumulate_days(cost_metrics_url, frames)
+
+
+def accumulate_days(cost_metrics_url, frames):
+    """
+    Accumulates {day: (names, columns)} into a cost frame with one row per allocation.
+    """
+    with tracing.span('merge', url=cost_metrics_url) as merge:
+        frame = cost_frame.from_columns(*cache.merge_days(frames.values()))
+        merge.add(rows=len(frame))
+    return frame
 
 
 def print_pandas_table(data):
@@ -46,72 +272,100 @@ def print_pandas_table(data):
     df.head()
 
 
-def slack_result_image_to_slack(data):
+def parse_channels(spec):
+    """
+    Parses a comma separated list of Slack channels, defaulting to SLACK_CHANNEL.
     """
-    Sends a result image to a Slack channel.
+    return [channel.strip() for channel in (spec or "").split(",") if channel.strip()] or [SLACK_CHANNEL]
 
-    Parameters:
-    - image_url (str): URL of the image to send to Slack
-    - slack_token (str): Slack API token
-    - slack_channel (str): Slack channel to send the image to
+
+def deliver_to_slack(artifacts, channels=(SLACK_CHANNEL,), comment=SLACK_COMMENT):
     """
-    df = pd.DataFrame(data).T
+    Uploads in-memory artifacts to Slack channels with the SLACK_API_TOKEN token.
 
-    # Create a figure and axis
-    fig, ax= plt.subplots(figsize=(6, 10))  # Adjust figure size as needed
+    Every artifact is uploaded once and shared to all channels, concurrently and with rate-limit aware
+    retries; channels already showing the same content are skipped, see delivery.SlackDelivery.
+    SLACK_API_URL points the client at another Slack API, e.g. a local stand-in.
 
+    Parameters:
+    - artifacts (list): delivery.Artifact to send.
+    - channels (list): Slack channels to send them to.
+    - comment (str): Message posted with every artifact.
 
-    ax.axis('off')  # Hide the axes
+    Returns:
+    - True if every channel got every artifact (or already had it).
+    """
+    client = slack_sdk.WebClient(token=os.getenv("SLACK_API_TOKEN"), base_url=SLACK_API_URL)
+    with tracing.span('slack_upload', channels=len(channels)) as upload:
+        with delivery.SlackDelivery(client) as slack:
+            for artifact in artifacts:
+                upload.add(bytes=len(artifact.data))
+                slack.submit(artifact, channels, comment)
+        upload.add(rows=sum(status == 'posted' for status in slack.results.values()))
+
+    for (channel, filename), status in sorted(slack.results.items()):
+        if status == 'skipped':
+            print(f"Skipped {filename} in {channel}: already posted")
+    failures = slack.failures()
+    for (channel, filename), error in sorted(failures.items()):
+        print(f"Failed to send {filename} to Slack channel {channel}: {error}")
+    return not failures
+
+
+def publish_to_slack(file_path, channel=SLACK_CHANNEL, comment=SLACK_COMMENT):
+    """
+    Uploads a file to a Slack channel with the SLACK_API_TOKEN token.
 
-    # Create a table with matplotlib
-    table = ax.table(cellText=df.values, colLabels=df.columns, cellLoc='center', loc='center')
-    table.scale(1, 1.5)  # Adjust the scale of the table
+    Parameters:
+    - file_path (str): File to upload.
+    - channel (str): Slack channel to send the file to.
+    - comment (str): Message posted with the file.
 
-    # Save the table as an image
-    plt.savefig("dataframe_matplotlib.png")
+    Returns:
+    - True if the file was sent (or the channel already had it).
+    """
+    return deliver_to_slack([delivery.Artifact.from_path(file_path)], [channel], comment)
 
-    slack_token = os.getenv("SLACK_API_TOKEN")
 
-    client = slack_sdk.WebClient(token=slack_token)
+def slack_result_image_to_slack(data, channels=(SLACK_CHANNEL,)):
+    """
+    Sends a result image to Slack channels.
 
-    try:
-        response = client.files_upload(
-            channels="D05T1HF3MNZ",
-            file='./dataframe_matplotlib.png',
-            initial_comment="Here is the detailed stats of the namespaces."
-        )
-    except Exception as e:
-        print(f"Failed to send image to Slack: {e}")
-        sys.exit(1)
+    Parameters:
+    - data (dict): Formatted report rows, see prettier_data.
+    - channels (list): Slack channels to send the image to.
+    """
+    image_path = render.RenderCache().get_or_render(render.digest(data, 'table'), 'png', lambda: render.table_png(data))
+    return deliver_to_slack([delivery.Artifact.from_path(image_path, "dataframe_matplotlib.png")], channels)
 
-    if not response["ok"]:
-        print(f"Failed to send image to Slack: {response['error']}")
 
+def plotly_treemap(frame, levels, root="Namespaces"):
+    """
+    Renders a cost frame as a plotly treemap through kaleido.
 
-def generate_treemap(data):
-    # Convert JSON to DataFrame
-    df = pd.DataFrame.from_dict(data, orient='index').reset_index().rename(columns={'index': 'namespace'})
+    Returns:
+    - PNG bytes.
+    """
+    df = frame.copy()
 
-    # Remove percentage and dollar signs, and convert to numeric
-    df['cpuEfficiency'] = df['cpuEfficiency'].str.replace('%', '').astype(float)
-    df['ramEfficiency'] = df['ramEfficiency'].str.replace('%', '').astype(float)
-    df['totalEfficiency'] = df['totalEfficiency'].str.replace('%', '').astype(float)
-    df['totalCost'] = df['totalCost'].str.replace('$', '').astype(float)
+    # Efficiencies are shown as percentages
+    for column in cost_frame.EFFICIENCIES:
+        df[column] = df[column] * 100
 
     # Replace zero or NaN values in totalCost with a small positive number
     df['totalCost'] = df['totalCost'].replace(0, 0.01).fillna(0.01)
     df['totalEfficiency'] = df['totalEfficiency'].replace(0, 0.01).fillna(0.01)
 
     # Add $ and % symbols for hover data
-    df['Total Cost'] = df['totalCost'].apply(lambda x: f"${x:.2f}")
-    df['CPU Efficiency'] = df['cpuEfficiency'].apply(lambda x: f"{x:.2f}%")
-    df['RAM Efficiency'] = df['ramEfficiency'].apply(lambda x: f"{x:.2f}%")
-    df['Total Efficiency'] = df['totalEfficiency'].apply(lambda x: f"{x:.2f}%")
+    df['Total Cost'] = cost_frame.format_cost(df['totalCost'])
+    df['CPU Efficiency'] = cost_frame.format_percent(df['cpuEfficiency'])
+    df['RAM Efficiency'] = cost_frame.format_percent(df['ramEfficiency'])
+    df['Total Efficiency'] = cost_frame.format_percent(df['totalEfficiency'])
 
     # Create the treemap using Plotly with formatted hover data
     fig = px.treemap(
         df,
-        path=[px.Constant("Namespaces"), 'namespace'],  # Hierarchical path
+        path=[px.Constant(root), *levels],  # Hierarchical path
         values='totalCost',  # Block size based on total cost
         color='totalEfficiency',  # Color based on total efficiency
         hover_data={
@@ -127,56 +381,320 @@ def generate_treemap(data):
     )
 
     # Update layout
-    fig.update_layout(margin=dict(t=50, l=25, r=25, b=25), title='Namespace Cost and Efficiency Treemap')
+    fig.update_layout(margin=render.MARGIN, title=render.TITLE)
 
-    # Update layout
-    fig.update_layout(margin=dict(t=50, l=25, r=25, b=25), title='Namespace Cost and Efficiency Treemap')
+    return fig.to_image(format="png")
 
-    # Save the figure as a PNG image
-    fig.write_image("namespace_treemap.png")
 
-    slack_token = os.getenv("SLACK_API_TOKEN")
+def render_treemap(frame, levels=None, root="Namespaces", renderer="plotly", render_cache=None):
+    """
+    Renders a cost frame as a treemap image.
 
-    client = slack_sdk.WebClient(token=slack_token)
+    Renders are cached by a hash of the frame, so identical data is not rendered again across runs.
 
-    try:
-        response = client.files_upload(
-            channels="D05T1HF3MNZ",
-            file='./namespace_treemap.png',
-            initial_comment="Here is the detailed stats of the namespaces."
-        )
-    except Exception as e:
-        print(f"Failed to send image to Slack: {e}")
-        sys.exit(1)
+    Parameters:
+    - frame: Cost frame, see frame.py. Rows with a cluster are nested under their cluster.
+    - levels (list): Columns forming the treemap hierarchy, e.g. from RollupIndex.view (default is the namespace).
+    - root (str): Label of the root block.
+    - renderer (str): 'plotly' (kaleido), 'matplotlib' (squarified layout on the Agg canvas) or 'svg'.
+    - render_cache (RenderCache): Cache of rendered images, defaults to one under COSTS_CACHE_DIR.
+
+    Returns:
+    - Path of the rendered image in the render cache.
+    """
+    if not levels:
+        levels = ['cluster', 'namespace'] if 'cluster' in frame else ['namespace']
+    render_cache = render_cache or render.RenderCache()
+
+    renderers = {
+        'plotly': lambda: plotly_treemap(frame, levels, root),
+        'matplotlib': lambda: render.treemap_png(frame, levels, root),
+        'svg': lambda: render.treemap_svg(frame, levels, root),
+    }
+    extension = 'svg' if renderer == 'svg' else 'png'
+    with tracing.span('render', renderer=renderer) as rendering:
+        key = render.digest(frame, 'treemap', renderer, levels, root)
+        image_path = render_cache.get_or_render(key, extension, renderers[renderer])
+        rendering.add(bytes=os.path.getsize(image_path), rows=len(frame))
+    return image_path
+
+
+def generate_treemap(frame, levels=None, root="Namespaces", renderer="plotly", render_cache=None,
+                     channels=(SLACK_CHANNEL,)):
+    """
+    Renders a cost frame as a treemap and sends it to Slack channels, see render_treemap for the parameters.
+
+    Returns:
+    - True if every channel got the treemap (or already had it).
+    """
+    image_path = render_treemap(frame, levels, root, renderer, render_cache)
+    filename = f"namespace_treemap{os.path.splitext(image_path)[1]}"
+    return deliver_to_slack([delivery.Artifact.from_path(image_path, filename)], channels)
+
+
+def prettier_data(frame):
+    """
+    Formats a cost frame for display, e.g. {"default": {"cpuEfficiency": "4.40%", ..., "totalCost": "$1.55"}}.
+
+    Parameters:
+    - frame: Cost frame, see frame.py.
 
-    if not response["ok"]:
-        print(f"Failed to send image to Slack: {response['error']}")
+    Returns:
+    - Dict of row label -> formatted metrics, in the order of the frame.
+    """
+    with tracing.span('format') as formatting:
+        formatting.add(rows=len(frame))
+        return cost_frame.format_frame(frame).to_dict(orient='index')
 
 
-def prettier_data(data):
+def parse_duration(duration):
+    """
+    Converts a duration such as '30s', '2m' or 45 into seconds.
     """
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    for suffix in sorted(units, key=len, reverse=True):
+        if duration.endswith(suffix):
+            return float(duration[:-len(suffix)]) * units[suffix]
+    return float(duration)
 
-    :param data:
-    :return:
+
+def namespace_data(cost_metrics_url, window='7d', use_cache=True, session=None, timeout=None, stream=True,
+                   aggregate='namespace'):
     """
+    Returns the accumulated namespace costs of one OpenCost endpoint as a cost frame.
 
-    result = {}
-    for namespace, metrics in data:
+    Parameters:
+    - cost_metrics_url (str): OpenCost allocation endpoint.
+    - window (str): Report window in days, e.g. '7d'.
+    - use_cache (bool): Serve closed days from the local allocation cache.
+    - session (requests.Session): Pooled session to reuse connections.
+    - timeout (float): Timeout in seconds of each OpenCost sub-request.
+    - stream (bool): Parse responses incrementally, see fetch_allocation_sets.
+    - aggregate (str): OpenCost aggregation, e.g. 'namespace' or 'cluster,namespace,controller,pod'.
+    """
+    if use_cache:
+        return cached_namespace_data(cost_metrics_url, window, aggregate, session=session, timeout=timeout,
+                                     stream=stream)
+    # Bypassing the cache still fetches the window in adaptive per-day pieces, it just stores none of them
+    days = fetch_days(cost_metrics_url, cache.window_days(window), aggregate, session, timeout, stream)
+    return accumulate_days(cost_metrics_url, days)
 
-        cpu_efficiency = metrics['cpuEfficiency'] * 100
-        ram_efficiency = metrics['ramEfficiency'] * 100
-        total_efficiency = metrics['totalEfficiency'] * 100
 
-        result[namespace] = {
-            "cpuEfficiency": f"{cpu_efficiency:.2f}%",
-            "ramEfficiency": f"{ram_efficiency:.2f}%",
-            "totalEfficiency": f"{total_efficiency:.2f}%",
-            "totalCost": f"${metrics['totalCost']:.2f}"
-        }
-    return result
+def query_clusters(endpoints, window='7d', timeout='30s', use_cache=True, stream=True, aggregate='namespace',
+                   session=None, deadline=None):
+    """
+    Queries several OpenCost endpoints concurrently and merges them into one ranking with a cluster dimension.
 
+    Parameters:
+    - endpoints (dict): Cluster name -> OpenCost base URL, see fanout.parse_endpoints.
+    - window (str): Report window in days, e.g. '7d'.
+    - timeout (str): Timeout of each OpenCost request, e.g. '30s'.
+    - use_cache (bool): Serve closed days from the local allocation cache.
+    - stream (bool): Parse responses incrementally, see fetch_allocation_sets.
+    - aggregate (str): OpenCost aggregation of every cluster.
+    - session (requests.Session): Pooled session shared by all clusters, created if not given.
+    - deadline (str): Time after which clusters still running are reported as failed, e.g. '5m' (default is
+      the request timeout times the request rounds of a cold window, see fanout.fan_out_deadline).
 
-def query_prometheus(timeout='30s'):
+    Returns:
+    - Cost frame with a cluster dimension, sorted by total cost, highest first.
+    """
+    def fetch(base_url, session, seconds):
+        cost_metrics_url = f"{base_url}/model/allocation/compute"
+        return namespace_data(cost_metrics_url, window, use_cache, session, seconds, stream, aggregate)
+
+    # Cold cache days are fetched as rounds of parallel sub-requests, each with the full timeout
+    rounds = chunked.max_rounds(len(cache.window_days(window)))
+    with tracing.span('fanout', clusters=len(endpoints)):
+        results, errors = fanout.fan_out(endpoints, fetch, timeout=parse_duration(timeout), session=session,
+                                         requests_per_endpoint=rounds,
+                                         connections_per_endpoint=chunked.DEFAULT_MAX_WORKERS,
+                                         deadline=parse_duration(deadline) if deadline else None)
+    for cluster, error in errors.items():
+        print(f"Failed to query cluster {cluster}: {error}")
+    if not results:
+        raise requests.exceptions.RequestException("All clusters failed")
+    with tracing.span('rank') as ranking:
+        ranked = cost_frame.rank(cost_frame.concat(results))
+        ranking.add(rows=len(ranked))
+    return ranked
+
+
+def query_rollup(levels, window='7d', endpoints=None, timeout='30s', use_cache=True, stream=True, session=None,
+                 deadline=None):
+    """
+    Fetches allocations once at the finest level and indexes them for drill-down.
+
+    Parameters:
+    - levels (list): Hierarchy from the root down, e.g. ['cluster', 'namespace', 'controller', 'pod'].
+    - window (str): Report window in days, e.g. '7d'.
+    - endpoints (dict): Cluster name -> OpenCost base URL; the cluster then comes from the endpoint and levels
+      must start with 'cluster'.
+    - timeout (str): Timeout of each OpenCost request, e.g. '30s'.
+    - use_cache (bool): Serve closed days from the local allocation cache.
+    - stream (bool): Parse responses incrementally, see fetch_allocation_sets.
+    - session (requests.Session): Pooled session to reuse connections.
+    - deadline (str): Time to wait for all endpoints, see query_clusters.
+
+    Returns:
+    - RollupIndex over the given levels.
+    """
+    if endpoints:
+        if levels[0] != 'cluster':
+            raise ValueError("Levels must start with 'cluster' when querying endpoints")
+        aggregate = rollup.aggregate_for(levels[1:])
+        costs = query_clusters(endpoints, window, timeout, use_cache, stream, aggregate, session, deadline)
+    else:
+        cost_metrics_url = f"{OPENCOST_URL}/model/allocation/compute"
+        costs = namespace_data(cost_metrics_url, window, use_cache, session, parse_duration(timeout), stream,
+                               rollup.aggregate_for(levels))
+    with tracing.span('rollup', levels=",".join(levels)) as indexing:
+        index = rollup.RollupIndex.from_frame(costs, levels)
+        indexing.add(rows=len(costs))
+    return index
+
+
+def rank_report(timeout='30s', window='7d', use_cache=True, endpoints=None, stream=True, levels=None, subtree=(),
+                session=None, deadline=None):
+    """
+    Fetches and ranks the costs of a report, see query_prometheus for the parameters.
+
+    Returns:
+    - Tuple of (ranked cost frame, treemap levels or None for the default, treemap root label).
+    """
+    if levels:
+        index = query_rollup(levels, window, endpoints, timeout, use_cache, stream, session, deadline)
+        with tracing.span('rank') as ranking:
+            ranked, path = index.view(subtree)
+            ranking.add(rows=len(ranked))
+        return ranked, path, "/".join(subtree) or "All"
+    if endpoints:
+        ranked = query_clusters(endpoints, window, timeout, use_cache, stream, session=session, deadline=deadline)
+    else:
+        cost_metrics_url = f"{OPENCOST_URL}/model/allocation/compute"
+        costs = namespace_data(cost_metrics_url, window, use_cache, session, parse_duration(timeout), stream)
+        with tracing.span('rank') as ranking:
+            ranked = cost_frame.rank(costs)
+            ranking.add(rows=len(ranked))
+    return ranked, None, "Namespaces"
+
+
+def trend_series(cost_metrics_url, window='28d', aggregate='namespace', session=None, timeout=None, stream=True,
+                 trend_dir=None):
+    """
+    Returns the daily trend series of one OpenCost endpoint, appending the closed days it does not have yet.
+
+    The series is kept next to the allocation cache, so every run only fetches (or reads from the cache) the
+    days closed since the previous one. Days OpenCost may still be filling in (see AllocationCache.is_closed)
+    are left out: once appended a day is never revisited, and a partial day would look like a drop.
+
+    Parameters:
+    - cost_metrics_url (str): OpenCost allocation endpoint, also used as the key of the series.
+    - window (str): History kept in days, e.g. '28d'; it should cover the baseline plus a week.
+    - aggregate (str): OpenCost aggregation, e.g. 'namespace'.
+    - session (requests.Session): Pooled session to reuse connections.
+    - timeout (float): Timeout in seconds of each OpenCost sub-request.
+    - stream (bool): Parse responses incrementally, see fetch_allocation_sets.
+    - trend_dir (str): Directory of the series, defaults to trend.DEFAULT_TREND_DIR.
+
+    Returns:
+    - trend.TrendSeries ending with the last closed day.
+    """
+    path = trend.trend_path(cost_metrics_url, aggregate, trend_dir or trend.DEFAULT_TREND_DIR)
+    allocation_cache = cache.AllocationCache()
+    closed = [day for day in cache.window_days(window) if allocation_cache.is_closed(day)]
+    if not closed:
+        raise ValueError(f"Window {window!r} has no closed day yet, use a longer one")
+    with tracing.span('trend_load', url=cost_metrics_url) as load:
+        series = trend.TrendSeries.load(path)
+        load.add(rows=len(series))
+    if series.next_day is not None and series.next_day < closed[0]:
+        # Too old to continue, start over rather than fetch the whole gap
+        series = trend.TrendSeries()
+    missing = [day for day in closed if series.next_day is None or day >= series.next_day]
+    if not missing:
+        return series
+
+    days = cached_days(cost_metrics_url, missing, aggregate, allocation_cache, session, timeout, stream)
+    with tracing.span('trend_append', url=cost_metrics_url, days=len(missing)) as append:
+        for day in missing:
+            names, columns = days[day]
+            # OpenCost may still fill in a day it has nothing for; it is appended once that is settled
+            if not len(names) and not allocation_cache.is_closed(day, empty=True):
+                break
+            series.append_day(day, names, columns)
+        append.add(rows=len(series))
+    series.save(path, keep=len(closed))
+    return series
+
+
+def query_trends(endpoints=None, window='28d', timeout='30s', stream=True, baseline_days=None, threshold=None,
+                 min_cost=0.0, session=None, deadline=None):
+    """
+    Ranks the namespaces whose cost or efficiency regressed yesterday against their rolling baseline.
+
+    Parameters:
+    - endpoints (dict): Cluster name -> OpenCost base URL to query concurrently instead of the in-cluster OpenCost.
+    - window (str): History kept in days, e.g. '28d'.
+    - timeout (str): Timeout of each OpenCost request, e.g. '30s'.
+    - stream (bool): Parse responses incrementally, see fetch_allocation_sets.
+    - baseline_days (int): Length of the rolling baseline (default is trend.DEFAULT_BASELINE_DAYS).
+    - threshold (float): Z-score reported as a regression (default is trend.DEFAULT_THRESHOLD).
+    - min_cost (float): Ignore namespaces that cost less than this yesterday.
+    - session (requests.Session): Pooled session to reuse connections.
+    - deadline (str): Time to wait for all endpoints, see query_clusters.
+
+    Returns:
+    - Regressions frame, see trend.TrendSeries.regressions, with a cluster column when querying endpoints.
+    """
+    baseline_days = baseline_days or trend.DEFAULT_BASELINE_DAYS
+    threshold = trend.DEFAULT_THRESHOLD if threshold is None else threshold
+
+    def regressions(cost_metrics_url, session, seconds):
+        series = trend_series(cost_metrics_url, window, session=session, timeout=seconds, stream=stream)
+        with tracing.span('regressions', url=cost_metrics_url) as ranking:
+            report = series.regressions(baseline_days, threshold, min_cost)
+            ranking.add(rows=len(report))
+        return report
+
+    if not endpoints:
+        return regressions(f"{OPENCOST_URL}/model/allocation/compute", session, parse_duration(timeout))
+
+    rounds = chunked.max_rounds(len(cache.window_days(window)))
+    with tracing.span('fanout', clusters=len(endpoints)):
+        results, errors = fanout.fan_out(
+            endpoints, lambda base_url, session, seconds: regressions(
+                f"{base_url}/model/allocation/compute", session, seconds
+            ),
+            timeout=parse_duration(timeout), session=session, requests_per_endpoint=rounds,
+            connections_per_endpoint=chunked.DEFAULT_MAX_WORKERS, deadline=parse_duration(deadline) if deadline else None,
+        )
+    for cluster, error in errors.items():
+        print(f"Failed to query cluster {cluster}: {error}")
+    if not results:
+        raise requests.exceptions.RequestException("All clusters failed")
+    merged = pd.concat(
+        [report.assign(cluster=cluster) for cluster, report in results.items()], ignore_index=True
+    )
+    merged.insert(0, "cluster", merged.pop("cluster").astype("category"))
+    merged["namespace"] = merged["namespace"].astype("category")
+    return cost_frame.rank(merged, by="impact")
+
+
+def prettier_regressions(report, limit=None):
+    """
+    Formats a regressions frame for display, e.g. {"prod": {"kind": "cost", "impact": "$12.00", ...}}.
+    """
+    with tracing.span('format') as formatting:
+        formatting.add(rows=len(report))
+        return trend.format_regressions(report.head(limit) if limit else report).to_dict(orient='index')
+
+
+def query_prometheus(timeout='30s', window='7d', use_cache=True, endpoints=None, stream=True, levels=None,
+                     subtree=(), renderer='plotly', session=None, channels=(SLACK_CHANNEL,), rankings=None,
+                     deadline=None):
     """
     Queries Prometheus for a given metric.
 
@@ -184,40 +702,316 @@ def query_prometheus(timeout='30s'):
     - prometheus_url (str): Base URL of Prometheus server (e.g., 'http://localhost:9090')
     - query (str): PromQL query to send to Prometheus
     - timeout (str): Query timeout, e.g., '30s' (default is '30s')
+    - window (str): Report window in days, e.g. '7d' (default is '7d')
+    - use_cache (bool): Serve closed days from the local allocation cache (default is True)
+    - endpoints (dict): Cluster name -> OpenCost base URL to query concurrently instead of the in-cluster OpenCost
+    - stream (bool): Parse OpenCost responses incrementally with bounded memory (default is True)
+    - levels (list): Drill-down hierarchy such as ['cluster', 'namespace', 'pod'], fetched once and rolled up locally
+    - subtree (tuple): Ancestor values to zoom the drill-down treemap into, e.g. ('prod', 'payments')
+    - renderer (str): Treemap backend, 'plotly', 'matplotlib' or 'svg' (default is 'plotly')
+    - session (requests.Session): Pooled session kept warm by the worker mode (default is a new connection per request)
+    - channels (list): Slack channels to send the treemap to (default is SLACK_CHANNEL)
+    - rankings (worker.Coalescer): Shares one OpenCost fetch and ranking between concurrent reports with the same
+      fetch options, whatever their renderer and channels (default is a fetch per report)
+    - deadline (str): Time to wait for all endpoints, e.g. '5m' (default is derived from the timeout, see query_clusters)
 
     Returns:
-    - JSON response from Prometheus with the query results
+    - JSON response from Prometheus with the query results, or None if they could not be queried or sent to
+      every channel
     """
-
-    cost_metrics_url = "http://opencost.opencost:9090/model/allocation/compute"
-    params = {'window': '7d', 'aggregate': 'namespace', 'includeIdle': 'true', 'step': '1d', 'accumulate': 'true'}
+    def rank():
+        return rank_report(timeout, window, use_cache, endpoints, stream, levels, subtree, session, deadline)
 
     try:
-        response = requests.get(cost_metrics_url, params=params)
-        response.raise_for_status()  # Raise an error for failed requests
-        data = response.json()
-        if data['status'] == 'success':
-            structured_data = filter_namespace_data(data['data'])
-            sorted_data = sorted(structured_data.items(), key=lambda item: item[1]['totalCost'], reverse=True)
-            pretty_data = prettier_data(sorted_data)
-            # slack_result_image_to_slack(pretty_data)
-            generate_treemap(pretty_data)
-            return pretty_data
+        if rankings is None:
+            ranked, path, root = rank()
         else:
-            raise Exception(f"Query failed with status: {data['status']}")
+            key = (timeout, window, use_cache, tuple(sorted((endpoints or {}).items())), stream, tuple(levels or ()),
+                   tuple(subtree), deadline)
+            (ranked, path, root), _ = rankings.run(key, rank)
+        pretty_data = prettier_data(ranked)
+        # slack_result_image_to_slack(pretty_data, channels)
+        if not generate_treemap(ranked, path, root, renderer=renderer, channels=channels):
+            return None
+        return pretty_data
     except requests.exceptions.RequestException as e:
         print(f"An error occurred: {e}")
         return None
 
 
-if __name__ == "__main__":
+def report_options(window='7d', endpoints='', levels='', subtree='', cache='true', stream='true', timeout='30s',
+                   deadline=''):
+    """
+    Converts string options, as given on the command line or in a worker request, into rank_report arguments.
+    """
+    return dict(
+        timeout=timeout,
+        window=window,
+        use_cache=cache.lower() != 'false',
+        endpoints=fanout.parse_endpoints(endpoints),
+        stream=stream.lower() != 'false',
+        levels=[level for level in levels.split(",") if level],
+        subtree=tuple(node for node in subtree.split("/") if node),
+        deadline=deadline or None,
+    )
+
+
+def run_report(renderer='plotly', session=None, channels='', rankings=None, **options):
+    """
+    Runs query_prometheus from string options, as given on the command line or in a worker request.
+
+    Parameters:
+    - renderer (str): Treemap backend.
+    - session (requests.Session): Pooled session to reuse connections.
+    - channels (str): Comma separated Slack channels to send the report to (default is SLACK_CHANNEL).
+    - rankings (worker.Coalescer): Shares fetches between concurrent reports, see query_prometheus.
+    - options: window, endpoints ('cluster=url,...'), levels ('cluster,namespace,pod'), subtree ('prod/payments'),
+      cache ('false' to bypass the allocation cache), stream ('false' to load responses whole), timeout and
+      deadline.
 
-    slack_token = os.getenv("SLACK_API_TOKEN")
-    if not slack_token:
-        print("Slack API token found")
+    Returns:
+    - Formatted report, see prettier_data, or None if OpenCost could not be queried or Slack delivery failed.
+    """
+    with tracing.span('report', renderer=renderer, **options):
+        return query_prometheus(renderer=renderer, session=session, channels=parse_channels(channels),
+                                rankings=rankings, **report_options(**options))
+
+
+def _report_arguments(args):
+    return dict(
+        window=args.window,
+        endpoints=args.endpoints,
+        levels=args.levels,
+        subtree=args.subtree,
+        cache='false' if args.no_cache else 'true',
+        stream='false' if args.no_stream else 'true',
+        timeout=args.timeout,
+        deadline=args.deadline,
+    )
+
+
+def _require_slack_token():
+    if not os.getenv("SLACK_API_TOKEN"):
+        print("Slack API token not found")
         sys.exit(1)
 
-    print("slack_token", slack_token)
 
-    prometheus_query_results = query_prometheus()
+def command_hello(args):
+    hello_world(args.name)
+
+
+def _rank_or_exit(args):
+    try:
+        return rank_report(**report_options(**_report_arguments(args)))
+    except requests.exceptions.RequestException as e:
+        print(f"An error occurred: {e}")
+        sys.exit(1)
+
+
+def command_query(args):
+    with tracing.span('query_command'):
+        ranked, _, _ = _rank_or_exit(args)
+        print(json.dumps(prettier_data(ranked), indent=2))
+
+
+def command_render(args):
+    with tracing.span('render_command'):
+        ranked, path, root = _rank_or_exit(args)
+        image_path = render_treemap(ranked, path, root, args.renderer)
+        output = args.output or f"namespace_treemap{os.path.splitext(image_path)[1]}"
+        shutil.copyfile(image_path, output)
+    print(output)
+
+
+def _regressions_or_exit(args):
+    try:
+        return query_trends(fanout.parse_endpoints(args.endpoints), args.trend_window, args.timeout,
+                            not args.no_stream, args.baseline_days, args.threshold, args.min_cost,
+                            deadline=args.deadline or None)
+    except requests.exceptions.RequestException as e:
+        print(f"An error occurred: {e}")
+        sys.exit(1)
+
+
+def command_regressions(args):
+    with tracing.span('regressions_command'):
+        report = _regressions_or_exit(args)
+        print(json.dumps(prettier_regressions(report, args.limit), indent=2))
+
+
+def command_publish(args):
+    _require_slack_token()
+    if not publish_to_slack(args.file, args.channel, args.comment):
+        sys.exit(1)
+
+
+def command_report(args):
+    options = dict(renderer=args.renderer, channels=args.channels, **_report_arguments(args))
+
+    if args.worker:
+        try:
+            print("Highest cost namespaces:", worker.request_report(args.worker, **options))
+        except (OSError, RuntimeError) as e:
+            print(f"An error occurred: {e}")
+            sys.exit(1)
+        return
+
+    _require_slack_token()
+
+    if args.serve:
+        port = args.port or worker.DEFAULT_PORT
+        # The worker always traces, its /metrics endpoint is the scrape target
+        tracing.TRACER.enabled = True
+        # Identical requests share a whole report; requests differing only in renderer or channels still
+        # share the OpenCost fetch
+        report = functools.partial(run_report, rankings=worker.Coalescer())
+        server = worker.make_server(report, fanout.make_session(), port=port, socket_path=args.socket or None,
+                                    metrics=tracing.TRACER.prometheus)
+        print(f"Serving cost reports on {args.socket or f'port {port}'}")
+        server.serve_forever()
+
+    prometheus_query_results = run_report(**options)
     print("Highest cost namespaces:", prometheus_query_results)
+    succeeded = prometheus_query_results is not None
+
+    if args.regressions:
+        regressions = prettier_regressions(_regressions_or_exit(args), args.limit)
+        print("Biggest regressions:", regressions)
+        if regressions:
+            image_path = render.RenderCache().get_or_render(
+                render.digest(regressions, 'regressions'), 'png', lambda: render.table_png(regressions)
+            )
+            artifact = delivery.Artifact.from_path(image_path, "namespace_regressions.png")
+            succeeded &= deliver_to_slack([artifact], parse_channels(args.channels), REGRESSIONS_COMMENT)
+
+    if not succeeded:
+        sys.exit(1)
+
+
+def export_traces(args):
+    """
+    Writes or pushes the collected stage metrics as requested on the command line.
+    """
+    if args.trace:
+        tracing.TRACER.write_trace(args.trace)
+    if args.metrics:
+        tracing.TRACER.write_prometheus(args.metrics)
+    if args.metrics_push:
+        try:
+            tracing.TRACER.push(args.metrics_push, job=f"costs_{args.command}")
+        except OSError as e:
+            print(f"Failed to push metrics to {args.metrics_push}: {e}", file=sys.stderr)
+
+
+COMMANDS = {
+    "hello": command_hello,
+    "query": command_query,
+    "render": command_render,
+    "publish": command_publish,
+    "report": command_report,
+    "regressions": command_regressions,
+}
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--import-times", action="store_true", help="Print how long each lazily imported module took to load")
+    common.add_argument("--trace", default="", help="Write a JSON trace of the pipeline stages to this file (Chrome trace format)")
+    common.add_argument("--metrics", default="", help="Write per-stage metrics in the Prometheus text format to this file, - for stdout")
+    common.add_argument("--metrics-push", default=os.getenv("COSTS_PUSHGATEWAY_URL", ""), help="Push per-stage metrics to this Prometheus Pushgateway")
+
+    fetching = argparse.ArgumentParser(add_help=False)
+    fetching.add_argument("--window", default="7d", help="Report window in days, e.g. 7d or 30d")
+    fetching.add_argument("--timeout", default="30s", help="Timeout of each OpenCost request, e.g. 30s")
+    fetching.add_argument("--deadline", default="", help="Give up on clusters still running after this long, e.g. 5m (default is the timeout times the request rounds a cold window may need)")
+    fetching.add_argument("--no-cache", action="store_true", help="Fetch the whole window instead of using the local allocation cache")
+    fetching.add_argument("--endpoints", default="", help="Comma separated OpenCost endpoints (cluster=url) to query concurrently")
+    fetching.add_argument("--no-stream", action="store_true", help="Load OpenCost responses whole instead of parsing them incrementally")
+    fetching.add_argument("--levels", default="", help="Drill-down hierarchy, e.g. cluster,namespace,controller,pod")
+    fetching.add_argument("--subtree", default="", help="Node to zoom the drill-down into, e.g. prod/payments")
+
+    trends = argparse.ArgumentParser(add_help=False)
+    trends.add_argument("--trend-window", default="28d", help="Daily history kept for the regression baselines, e.g. 28d")
+    trends.add_argument("--baseline-days", type=int, default=None, help="Days in the rolling baseline (default is 14)")
+    trends.add_argument("--threshold", type=float, default=None, help="Z-score reported as a regression (default is 3)")
+    trends.add_argument("--min-cost", type=float, default=0.0, help="Ignore namespaces that cost less than this yesterday")
+    trends.add_argument("--limit", type=int, default=20, help="Regressions shown, biggest impact first")
+
+    rendering = argparse.ArgumentParser(add_help=False)
+    rendering.add_argument("--renderer", default="plotly", choices=RENDERERS, help="Treemap rendering backend")
+
+    parser = argparse.ArgumentParser(description="Kubernetes namespace cost reports from OpenCost")
+    commands = parser.add_subparsers(dest="command")
+
+    hello = commands.add_parser("hello", parents=[common], help="Print a greeting")
+    hello.add_argument("name", help="name to say hello to")
+
+    commands.add_parser("query", parents=[common, fetching], help="Print the ranked namespace costs as JSON")
+
+    render_command = commands.add_parser("render", parents=[common, fetching, rendering], help="Render the cost treemap to a file")
+    render_command.add_argument("--output", default="", help="Image path, defaults to namespace_treemap.<png|svg>")
+
+    publish = commands.add_parser("publish", parents=[common], help="Upload a file to Slack")
+    publish.add_argument("file", help="File to upload")
+    publish.add_argument("--channel", default=SLACK_CHANNEL, help="Slack channel")
+    publish.add_argument("--comment", default=SLACK_COMMENT, help="Message posted with the file")
+
+    commands.add_parser("regressions", parents=[common, fetching, trends], help="Print the namespaces whose cost or efficiency regressed yesterday as JSON")
+
+    report = commands.add_parser("report", parents=[common, fetching, rendering, trends], help="Query, render and publish the cost report (default)")
+    report.add_argument("--serve", action="store_true", help="Run as a long-lived worker serving /report requests")
+    report.add_argument("--port", type=int, default=None, help="Worker TCP port")
+    report.add_argument("--socket", default="", help="Serve the worker on this Unix socket instead of TCP")
+    report.add_argument("--channels", default=os.getenv("COSTS_SLACK_CHANNELS", ""), help=f"Comma separated Slack channels to send the report to (default is {SLACK_CHANNEL})")
+    report.add_argument("--regressions", action="store_true", help="Also report the biggest cost and efficiency regressions")
+    report.add_argument("--worker", default=os.getenv("COSTS_WORKER_URL", ""), help="Delegate the report to a running worker, e.g. unix:///tmp/costs.sock")
+    return parser
+
+
+def _check_arguments(parser, args):
+    """
+    Reports fetching options that cannot work through parser.error, before anything is fetched.
+    """
+    for option in ("window", "trend_window"):
+        if getattr(args, option, None) is not None:
+            try:
+                cache.window_days(getattr(args, option))
+            except ValueError as e:
+                parser.error(f"--{option.replace('_', '-')}: {e}")
+    if getattr(args, "window", None) is None:
+        return
+    levels = [level for level in args.levels.split(",") if level]
+    subtree = [node for node in args.subtree.split("/") if node]
+    if len(set(levels)) != len(levels):
+        parser.error(f"--levels: {args.levels!r} repeats a level")
+    if levels and args.endpoints and levels[0] != "cluster":
+        parser.error("--levels must start with 'cluster' when querying --endpoints, e.g. cluster,namespace,pod")
+    if subtree and not levels:
+        parser.error("--subtree needs --levels to drill down into")
+    if subtree and len(subtree) >= len(levels):
+        parser.error(f"--subtree {args.subtree!r} must be above the last of --levels {args.levels!r}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Without a subcommand, run the full report as the tools always did
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv = ["report", *argv]
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    _check_arguments(parser, args)
+    if args.trace or args.metrics or args.metrics_push:
+        tracing.TRACER.enabled = True
+    try:
+        COMMANDS[args.command](args)
+    finally:
+        export_traces(args)
+        if args.import_times:
+            for name, seconds in sorted(IMPORT_TIMES.items(), key=lambda item: item[1], reverse=True):
+                print(f"import {name}: {seconds * 1000:.1f} ms", file=sys.stderr)
+            print(f"total: {(time.perf_counter() - _STARTED) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import hashlib
+import io
+import json
+import os
+from html import escape
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import cache
+except ImportError:  # running as a script next to the shipped modules
+    import cache
+
+TITLE = "Namespace Cost and Efficiency Treemap"
+WIDTH, HEIGHT = 1200, 800
+MARGIN = dict(t=50, l=25, r=25, b=25)
+PADDING = 3  # space between a parent block and its children
+HEADER = 16  # room for the parent label above its children
+
+# RdYlGn reversed, the scale the plotly treemap uses: low efficiency green, high efficiency red
+COLOR_STOPS = [
+    "#006837", "#1a9850", "#66bd63", "#a6d96a", "#d9ef8b", "#ffffbf",
+    "#fee08b", "#fdae61", "#f46d43", "#d73027", "#a50026",
+]
+
+
+def digest(data, *extra):
+    """
+    Returns a content hash of a frame (or any JSON-serializable value) plus extra render options.
+    """
+    sha = hashlib.sha256()
+    if isinstance(data, pd.DataFrame):
+        sha.update(json.dumps([str(column) for column in data.columns]).encode())
+        sha.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    else:
+        sha.update(json.dumps(data, sort_keys=True, default=str).encode())
+    sha.update(json.dumps(extra, default=str).encode())
+    return sha.hexdigest()
+
+
+class RenderCache:
+    """
+    Content-addressed cache of rendered images, so identical data is rendered once across runs and channels.
+    """
+
+    def __init__(self, cache_dir=os.path.join(cache.DEFAULT_CACHE_DIR, "renders"), max_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def get_or_render(self, key, extension, render):
+        """
+        Returns the path of the cached image for `key`, calling render() -> bytes only on a miss.
+        """
+        path = os.path.join(self.cache_dir, f"{key}.{extension}")
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        data = render()
+        cache.atomic_write(path, lambda f: f.write(data))
+        self.evict()
+        return path
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            cache._remove(path)
+            total -= size
+
+
+def squarify(values, x, y, width, height):
+    """
+    Lays values out as rectangles with aspect ratios close to 1 (Bruls, Huizing and van Wijk).
+
+    Parameters:
+    - values: Positive sizes, ideally sorted from largest to smallest.
+    - x, y, width, height: The rectangle to fill.
+
+    Returns:
+    - List of (x, y, width, height) tuples, one per value.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    total = values.sum()
+    if not len(values) or total <= 0 or width <= 0 or height <= 0:
+        return [(x, y, 0.0, 0.0)] * len(values)
+    areas = np.maximum(values, 0) * (width * height / total)
+
+    def worst(row_sum, row_min, row_max, side):
+        side2, sum2 = side * side, row_sum * row_sum
+        return max(side2 * row_max / sum2, sum2 / (side2 * max(row_min, 1e-12)))
+
+    rects = []
+    i = 0
+    while i < len(areas):
+        side = min(width, height)
+        row_sum = row_min = row_max = areas[i]
+        j = i + 1
+        while j < len(areas):
+            grown = (row_sum + areas[j], min(row_min, areas[j]), max(row_max, areas[j]))
+            if worst(*grown, side) > worst(row_sum, row_min, row_max, side):
+                break
+            row_sum, row_min, row_max = grown
+            j += 1
+
+        if width >= height:
+            column = row_sum / height if height else 0.0
+            offset = y
+            for area in areas[i:j]:
+                size = area / column if column else 0.0
+                rects.append((x, offset, column, size))
+                offset += size
+            x, width = x + column, width - column
+        else:
+            row = row_sum / width if width else 0.0
+            offset = x
+            for area in areas[i:j]:
+                size = area / row if row else 0.0
+                rects.append((offset, y, size, row))
+                offset += size
+            y, height = y + row, height - row
+        i = j
+    return rects
+
+
+def layout(frame, levels, x=MARGIN["l"], y=MARGIN["t"], width=WIDTH - MARGIN["l"] - MARGIN["r"],
+           height=HEIGHT - MARGIN["t"] - MARGIN["b"]):
+    """
+    Computes a nested squarified layout of a cost frame.
+
+    Parameters:
+    - frame: Cost frame with one column per level and the metrics; block sizes follow totalCost.
+    - levels (list): Hierarchy columns from the outermost down, e.g. ['cluster', 'namespace'].
+
+    Returns:
+    - List of (depth, label, (x, y, w, h), row) tuples; `row` is the dict of the frame row for leaves and None
+      for parent blocks.
+    """
+    nodes = []
+    df = frame.assign(totalCost=frame["totalCost"].where(frame["totalCost"] > 0, 0.01))
+    _layout(df, list(levels), (x, y, width, height), 0, nodes)
+    return nodes
+
+
+def _layout(df, levels, rect, depth, nodes):
+    if len(levels) == 1:
+        leaves = df.sort_values("totalCost", ascending=False)
+        for row, child in zip(leaves.to_dict("records"), squarify(leaves["totalCost"].to_numpy(), *rect)):
+            nodes.append((depth, str(row[levels[0]]), child, row))
+        return
+
+    totals = df.groupby(levels[0], observed=True, sort=False)["totalCost"].sum().sort_values(ascending=False)
+    groups = dict(list(df.groupby(levels[0], observed=True, sort=False)))
+    for (name, _), child in zip(totals.items(), squarify(totals.to_numpy(), *rect)):
+        nodes.append((depth, str(name), child, None))
+        cx, cy, cw, ch = child
+        inner = (cx + PADDING, cy + HEADER, max(cw - 2 * PADDING, 0), max(ch - HEADER - PADDING, 0))
+        _layout(groups[name], levels[1:], inner, depth + 1, nodes)
+
+
+def colors(values):
+    """
+    Maps values onto the RdYlGn_r scale spanning their min and max, like a plotly continuous color scale.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    low, high = (np.nanmin(values), np.nanmax(values)) if len(values) else (0.0, 1.0)
+    position = (values - low) / (high - low) if high > low else np.zeros_like(values)
+    stops = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in COLOR_STOPS], dtype=np.float64)
+    scaled = np.clip(np.nan_to_num(position), 0, 1) * (len(stops) - 1)
+    lower = np.minimum(scaled.astype(int), len(stops) - 2)
+    fraction = (scaled - lower)[:, None]
+    rgb = stops[lower] * (1 - fraction) + stops[lower + 1] * fraction
+    return ["#%02x%02x%02x" % tuple(channel) for channel in np.rint(rgb).astype(int)]
+
+
+def _leaf_label(label, row, w, h):
+    if w < 60 or h < 30:
+        return label if w >= 40 and h >= 14 else ""
+    return f"{label}\n${row['totalCost']:.2f}\n{row['totalEfficiency'] * 100:.2f}%"
+
+
+def treemap_png(frame, levels, root="Namespaces", title=TITLE):
+    """
+    Renders a squarified treemap with the matplotlib Agg canvas, without pyplot or a headless browser.
+
+    Returns:
+    - PNG bytes.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import PatchCollection
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Rectangle
+
+    nodes = layout(frame, levels)
+    leaves = [node for node in nodes if node[3] is not None]
+    fills = colors([row["totalEfficiency"] for _, _, _, row in leaves])
+
+    figure = Figure(figsize=(WIDTH / 100, HEIGHT / 100), dpi=100)
+    FigureCanvasAgg(figure)
+    ax = figure.add_axes([0, 0, 1, 1])
+    ax.set_xlim(0, WIDTH)
+    ax.set_ylim(HEIGHT, 0)
+    ax.axis("off")
+    ax.text(MARGIN["l"], MARGIN["t"] / 2, f"{title} ({root})", fontsize=14, va="center")
+
+    parents = [Rectangle(rect[:2], *rect[2:]) for _, _, rect, row in nodes if row is None]
+    ax.add_collection(PatchCollection(parents, facecolor="#f0f0f0", edgecolor="#ffffff", linewidth=1.5))
+    ax.add_collection(PatchCollection(
+        [Rectangle(rect[:2], *rect[2:]) for _, _, rect, _ in leaves],
+        facecolor=fills, edgecolor="#ffffff", linewidth=0.8,
+    ))
+
+    for _, label, (x, y, w, h), row in nodes:
+        if row is None:
+            if w >= 40:
+                ax.text(x + PADDING, y + HEADER / 2, label, fontsize=8, va="center", clip_on=True)
+            continue
+        text = _leaf_label(label, row, w, h)
+        if text:
+            ax.text(x + w / 2, y + h / 2, text, fontsize=7, ha="center", va="center", clip_on=True)
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def treemap_svg(frame, levels, root="Namespaces", title=TITLE):
+    """
+    Emits a squarified treemap directly as SVG markup; hovering a block shows its cost and efficiencies.
+
+    Returns:
+    - SVG bytes.
+    """
+    nodes = layout(frame, levels)
+    leaves = [node for node in nodes if node[3] is not None]
+    fills = iter(colors([row["totalEfficiency"] for _, _, _, row in leaves]))
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" '
+        f'font-family="sans-serif" viewBox="0 0 {WIDTH} {HEIGHT}">',
+        f'<rect width="{WIDTH}" height="{HEIGHT}" fill="#ffffff"/>',
+        f'<text x="{MARGIN["l"]}" y="{MARGIN["t"] / 2}" font-size="18">{escape(title)} ({escape(root)})</text>',
+    ]
+    for _, label, (x, y, w, h), row in nodes:
+        rect = f'x="{x:.1f}" y="{y:.1f}" width="{w:.1f}" height="{h:.1f}" stroke="#ffffff"'
+        if row is None:
+            parts.append(f'<rect {rect} fill="#f0f0f0" stroke-width="1.5"/>')
+            if w >= 40:
+                parts.append(f'<text x="{x + PADDING:.1f}" y="{y + HEADER - 4:.1f}" font-size="11">{escape(label)}</text>')
+            continue
+        hover = (
+            f"{label}\nTotal Cost: ${row['totalCost']:.2f}\nCPU Efficiency: {row['cpuEfficiency'] * 100:.2f}%\n"
+            f"RAM Efficiency: {row['ramEfficiency'] * 100:.2f}%\nTotal Efficiency: {row['totalEfficiency'] * 100:.2f}%"
+        )
+        parts.append(f'<g><title>{escape(hover)}</title><rect {rect} fill="{next(fills)}" stroke-width="0.8"/>')
+        text = _leaf_label(label, row, w, h)
+        lines = text.split("\n") if text else []
+        for i, line in enumerate(lines):
+            ty = y + h / 2 + (i - (len(lines) - 1) / 2) * 12
+            parts.append(
+                f'<text x="{x + w / 2:.1f}" y="{ty:.1f}" font-size="10" text-anchor="middle" '
+                f'dominant-baseline="middle">{escape(line)}</text>'
+            )
+        parts.append("</g>")
+    parts.append("</svg>")
+    return "\n".join(parts).encode()
+
+
+def table_png(data):
+    """
+    Renders formatted report rows as a table image with the matplotlib Agg canvas.
+
+    Parameters:
+    - data (dict): Row label -> formatted metrics, as returned by prettier_data.
+
+    Returns:
+    - PNG bytes.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    df = pd.DataFrame(data).T
+
+    figure = Figure(figsize=(6, 10))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    ax.axis('off')
+    table = ax.table(cellText=df.values, colLabels=df.columns, cellLoc='center', loc='center')
+    table.scale(1, 1.5)
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from . import cache
+    from . import frame as cost_frame
+except ImportError:  # running as a script next to the shipped modules
+    import cache
+    import frame as cost_frame
+
+LEVELS = ["cluster", "namespace", "controller", "pod"]
+UNALLOCATED = "__unallocated__"
+
+# Sums kept per node; efficiencies are derived from them so they stay cost weighted at every level
+_SUMS = ["cpuCost", "ramCost", "totalCost", "cpuWeighted", "ramWeighted", "totalWeighted"]
+
+
+def aggregate_for(levels):
+    """
+    Returns the OpenCost `aggregate` parameter that fetches the finest granularity of the given levels.
+    """
+    return ",".join(levels)
+
+
+class RollupIndex:
+    """
+    Hierarchical roll-up of allocations fetched once at the finest granularity.
+
+    Every level of the hierarchy (e.g. cluster, cluster/namespace, cluster/namespace/controller, ...) is
+    precomputed bottom-up with summed costs and cost-weighted efficiencies, so any level or subtree can be
+    served for treemaps and tables without querying OpenCost again.
+    """
+
+    def __init__(self, leaves, levels=LEVELS):
+        """
+        Parameters:
+        - leaves (DataFrame): One row per finest-level allocation, with a column per level plus the metrics.
+        - levels (list): Level names from the root down, e.g. ['cluster', 'namespace', 'pod'].
+        """
+        self.levels = list(levels)
+        self._nodes = {}
+
+        current = leaves[self.levels].astype("category")
+        current = current.assign(
+            cpuCost=leaves["cpuCost"].to_numpy(),
+            ramCost=leaves["ramCost"].to_numpy(),
+            totalCost=leaves["totalCost"].to_numpy(),
+            cpuWeighted=(leaves["cpuEfficiency"] * leaves["cpuCost"]).to_numpy(),
+            ramWeighted=(leaves["ramEfficiency"] * leaves["ramCost"]).to_numpy(),
+            totalWeighted=(leaves["totalEfficiency"] * (leaves["cpuCost"] + leaves["ramCost"])).to_numpy(),
+        )
+        # Each level is summed from the one below it, which is much smaller than the leaves
+        for depth in range(len(self.levels), 0, -1):
+            current = current.groupby(self.levels[:depth], observed=True, sort=False)[_SUMS].sum().reset_index()
+            self._nodes[depth] = self._with_efficiencies(current, depth)
+
+    @classmethod
+    def from_frame(cls, frame, levels=LEVELS):
+        """
+        Builds the index from a cost frame fetched with aggregate=aggregate_for(levels).
+
+        OpenCost names multi-property aggregations 'cluster/namespace/controller/pod'; the names are split
+        into one column per level, and missing parts (idle or unmounted allocations) become __unallocated__.
+        """
+        parts = pd.Series(cost_frame.labels(frame)).str.split("/", n=len(levels) - 1, expand=True)
+        parts = parts.reindex(columns=range(len(levels))).fillna(UNALLOCATED)
+        leaves = pd.DataFrame({level: parts[i].to_numpy() for i, level in enumerate(levels)})
+        for metric in cost_frame.METRICS:
+            leaves[metric] = frame[metric].to_numpy()
+        return cls(leaves, levels)
+
+    def _with_efficiencies(self, sums, depth):
+        efficiencies = cache.weighted_efficiencies(
+            sums["cpuCost"].to_numpy(),
+            sums["ramCost"].to_numpy(),
+            sums["cpuWeighted"].to_numpy(),
+            sums["ramWeighted"].to_numpy(),
+            sums["totalWeighted"].to_numpy(),
+        )
+        nodes = sums[self.levels[:depth]].copy()
+        for metric in cost_frame.METRICS:
+            nodes[metric] = efficiencies[metric] if metric in efficiencies else sums[metric].to_numpy()
+        return nodes
+
+    def depth(self, level):
+        """
+        Returns the 1-based depth of a level name (or passes a depth through).
+        """
+        return level if isinstance(level, int) else self.levels.index(level) + 1
+
+    def level(self, level, subtree=()):
+        """
+        Returns every node of a level, optionally restricted to a subtree.
+
+        Parameters:
+        - level: Level name or 1-based depth.
+        - subtree (tuple): Ancestor values from the root, e.g. ('prod', 'payments').
+
+        Returns:
+        - Frame with one column per level down to `level` plus the metrics, highest total cost first.
+        """
+        depth = self.depth(level)
+        if len(subtree) >= depth:
+            raise ValueError(f"Subtree {subtree} is not above level {self.levels[depth - 1]!r}")
+        nodes = self._nodes[depth]
+        if subtree:
+            mask = np.logical_and.reduce([
+                (nodes[name] == value).to_numpy() for name, value in zip(self.levels, subtree)
+            ])
+            nodes = nodes[mask]
+        return cost_frame.rank(nodes)
+
+    def children(self, subtree=()):
+        """
+        Returns the direct children of a node, the top level for the root.
+        """
+        return self.level(len(subtree) + 1, subtree)
+
+    def node(self, path):
+        """
+        Returns the metrics of a single node as a dict, or None if it does not exist.
+        """
+        nodes = self.level(len(path), tuple(path[:-1]))
+        match = nodes[(nodes[self.levels[len(path) - 1]] == path[-1]).to_numpy()]
+        if match.empty:
+            return None
+        return {metric: float(match[metric].iloc[0]) for metric in cost_frame.METRICS}
+
+    def view(self, subtree=(), depth=None):
+        """
+        Returns the nodes below a subtree down to `depth` for a treemap, with the fixed ancestors dropped.
+
+        Returns:
+        - Tuple of (frame, levels of the treemap path).
+        """
+        depth = self.depth(depth or len(self.levels))
+        levels = self.levels[len(subtree):depth]
+        nodes = self.level(depth, subtree)
+        return nodes.drop(columns=self.levels[:len(subtree)]), levels
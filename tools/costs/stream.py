@@ -0,0 +1,173 @@
+import codecs
+import json
+from array import array
+
+import numpy as np
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """
+    Incremental JSON reader over an iterator of byte chunks.
+
+    Only the unconsumed tail of the body is kept in memory, so the buffer never grows much beyond the
+    largest single value that is decoded at once.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.buf += self.decoder.decode(b"", final=True)
+            self.eof = True
+        else:
+            # Drop what has already been consumed before growing the buffer
+            self.buf = self.buf[self.pos:] + self.decoder.decode(chunk)
+            self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON body")
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r} at offset {self.pos}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending exactly at the buffer boundary may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_allocations(chunks):
+    """
+    Yields the allocation entries of an OpenCost /allocation/compute body one at a time.
+
+    Parameters:
+    - chunks: Iterable of raw body bytes, e.g. response.iter_content(CHUNK_SIZE) of a stream=True request.
+
+    Returns:
+    - Generator of (set index, allocation name, allocation dict) tuples. A non successful status raises.
+    """
+    reader = _Reader(chunks)
+    reader.expect("{")
+    meta = {}
+    if reader.peek() == "}":
+        reader.expect("}")
+    else:
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            if key == "data" and reader.peek() == "[":
+                if meta.get("status", "success") != "success":
+                    raise Exception(f"Query failed with status: {meta['status']}")
+                yield from _iter_sets(reader)
+            else:
+                meta[key] = reader.value()
+            if reader.expect(",}") == "}":
+                break
+    if meta.get("status") != "success":
+        raise Exception(f"Query failed with status: {meta.get('status')}")
+
+
+def _iter_sets(reader):
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.expect("]")
+        return
+    index = 0
+    while True:
+        if reader.peek() == "n":
+            reader.value()  # null allocation set
+        else:
+            reader.expect("{")
+            if reader.peek() == "}":
+                reader.expect("}")
+            else:
+                while True:
+                    name = reader.value()
+                    reader.expect(":")
+                    yield index, name, reader.value()
+                    if reader.expect(",}") == "}":
+                        break
+        index += 1
+        if reader.expect(",]") == "]":
+            return
+
+
+class ColumnAccumulator:
+    """
+    Collects the namespaced allocations of one allocation set into compact float64 columns.
+    """
+
+    def __init__(self, fields):
+        self.names = []
+        self.values = {field: array("d") for field in fields}
+        self.window_start = None
+
+    def add(self, name, allocation):
+        if self.window_start is None:
+            self.window_start = (allocation.get("window") or {}).get("start")
+        if not (allocation.get("properties") or {}).get("namespace"):
+            return
+        self.names.append(name)
+        for field, values in self.values.items():
+            values.append(allocation.get(field) or 0.0)
+
+    def columns(self):
+        """
+        Returns (names array, {field: float64 array}).
+        """
+        return (
+            np.array(self.names, dtype=str),
+            {field: np.frombuffer(values, dtype=np.float64) for field, values in self.values.items()},
+        )
+
+
+def accumulate_sets(allocations, fields):
+    """
+    Folds (set index, name, allocation) tuples into one ColumnAccumulator per allocation set.
+
+    Parameters:
+    - allocations: Iterable as produced by iter_allocations.
+    - fields: Metrics to keep for every namespaced allocation.
+
+    Returns:
+    - List of ColumnAccumulator, one per allocation set, in response order.
+    """
+    sets = []
+    for index, name, allocation in allocations:
+        while len(sets) <= index:
+            sets.append(ColumnAccumulator(fields))
+        sets[index].add(name, allocation)
+    return sets
@@ -1,9 +1,34 @@
 import inspect
 
-from kubiya_sdk.tools.models import Arg, Tool, FileSpec
+from kubiya_sdk.tools.models import Arg, Tool, FileSpec, Volume
 from kubiya_sdk.tools.registry import tool_registry
 
-from . import main
+from . import cache, chunked, delivery, fanout, frame, main, render, rollup, stream, tracing, trend, worker
+
+
+def source_files(*modules):
+    """
+    Ships every module next to /tmp/main.py so its sibling imports resolve inside the tool container.
+    """
+    return [
+        FileSpec(
+            destination=f"/tmp/{module.__name__.rsplit('.', 1)[-1]}.py",
+            content=inspect.getsource(module),
+        )
+        for module in modules
+    ]
+
+
+# main.py imports its siblings lazily, so every tool only ships (and installs) what its subcommand uses
+QUERY_FILES = source_files(main, cache, chunked, fanout, frame, rollup, stream, tracing, trend)
+REPORT_FILES = source_files(
+    main, cache, chunked, delivery, fanout, frame, render, rollup, stream, tracing, trend, worker
+)
+
+# Every run gets a fresh container; the caches (allocation days, renders, Slack posts, trends) live on a
+# named volume so later runs only fetch what changed since the last one
+CACHE_DIR = "/var/cache/costs-optimizations"
+CACHE_VOLUMES = [Volume(name="costs-optimizations-cache", path=CACHE_DIR)]
 
 hello_tool = Tool(
     name="say_hello",
@@ -12,15 +37,10 @@ hello_tool = Tool(
     description="Prints hello {name}!",
     args=[Arg(name="name", description="name to say hello to", required=True)],
     content="""
-pip install argparse > /dev/null 2>&1
-pip install requests > /dev/null 2>&1
-python /tmp/main.py "{{ .name }}"
+python /tmp/main.py hello "{{ .name }}"
 """,
     with_files=[
-        FileSpec(
-            destination="/tmp/main.py",
-            content=inspect.getsource(main),
-        ),
+        *source_files(main),
         # Add any requirements here if needed
         # FileSpec(
         #     destination="/tmp/requirements.txt",
@@ -39,14 +59,11 @@ query_prometheus = Tool(
 pip install argparse > /dev/null 2>&1
 pip install requests > /dev/null 2>&1
 pip install pandas > /dev/null 2>&1
-python /tmp/main.py
-""",
-    with_files=[
-        FileSpec(
-            destination="/tmp/main.py",
-            content=inspect.getsource(main),
-        ),
-    ],
+pip install numpy > /dev/null 2>&1
+COSTS_CACHE_DIR=%s python /tmp/main.py query
+""" % CACHE_DIR,
+    with_files=QUERY_FILES,
+    with_volumes=CACHE_VOLUMES,
 )
 
 namespaces_highest_cost = Tool(
@@ -54,7 +71,30 @@ namespaces_highest_cost = Tool(
     type="docker",
     image="python:3.11",
     description="Query for highest cost kubernetes namespaces",
-    args=[],
+    args=[
+        Arg(
+            name="endpoints",
+            description="Comma separated OpenCost endpoints (cluster=url) to query concurrently, defaults to the in-cluster OpenCost",
+            required=False,
+        ),
+        Arg(
+            name="channels",
+            description="Comma separated Slack channels to send the report to, defaults to the cost reports channel",
+            required=False,
+        ),
+        Arg(
+            name="metrics_push",
+            description="Prometheus Pushgateway URL to push per-stage timings of the run to",
+            required=False,
+        ),
+        Arg(
+            name="renderer",
+            description="Treemap rendering backend: matplotlib, svg, or plotly (needs kaleido, slower to install and run)",
+            required=False,
+            default="matplotlib",
+            options=["matplotlib", "svg", "plotly"],
+        ),
+    ],
     secrets=[
         "SLACK_API_TOKEN",
     ],
@@ -62,19 +102,42 @@ namespaces_highest_cost = Tool(
 pip install argparse > /dev/null 2>&1
 pip install requests > /dev/null 2>&1
 pip install pandas > /dev/null 2>&1
-pip install slack-sdk==3.11.0 > /dev/null 2>&1
+pip install slack-sdk==3.45.0 > /dev/null 2>&1
 pip install matplotlib > /dev/null 2>&1
-pip install -U kaleido > /dev/null 2>&1
-pip install -U plotly > /dev/null 2>&1
 pip install numpy > /dev/null 2>&1
-python /tmp/main.py
-""",
-    with_files=[
-        FileSpec(
-            destination="/tmp/main.py",
-            content=inspect.getsource(main),
+RENDERER="{{ .renderer }}"
+RENDERER="${RENDERER:-matplotlib}"
+if [ "$RENDERER" = "plotly" ]; then
+  pip install -U kaleido > /dev/null 2>&1
+  pip install -U plotly > /dev/null 2>&1
+fi
+COSTS_CACHE_DIR=%s python /tmp/main.py report --endpoints "{{ .endpoints }}" --channels "{{ .channels }}" --metrics-push "{{ .metrics_push }}" --renderer "$RENDERER"
+""" % CACHE_DIR,
+    with_files=REPORT_FILES,
+    with_volumes=CACHE_VOLUMES,
+)
+
+namespaces_biggest_regressions = Tool(
+    name="namespaces_biggest_regressions",
+    type="docker",
+    image="python:3.11",
+    description="Query for kubernetes namespaces whose cost jumped or whose efficiency dropped yesterday",
+    args=[
+        Arg(
+            name="endpoints",
+            description="Comma separated OpenCost endpoints (cluster=url) to query concurrently, defaults to the in-cluster OpenCost",
+            required=False,
         ),
     ],
+    content="""
+pip install argparse > /dev/null 2>&1
+pip install requests > /dev/null 2>&1
+pip install pandas > /dev/null 2>&1
+pip install numpy > /dev/null 2>&1
+COSTS_CACHE_DIR=%s python /tmp/main.py regressions --endpoints "{{ .endpoints }}"
+""" % CACHE_DIR,
+    with_files=QUERY_FILES,
+    with_volumes=CACHE_VOLUMES,
 )
 
 # lowest_cpu_efficiency = Tool(
@@ -99,4 +162,5 @@ python /tmp/main.py
 
 tool_registry.register(hello_tool)
 tool_registry.register(namespaces_highest_cost)
+tool_registry.register(namespaces_biggest_regressions)
 
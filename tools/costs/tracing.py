@@ -0,0 +1,243 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import deque
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+MAX_SPANS = 10000  # spans kept for the JSON trace; per-stage totals are kept regardless
+METRIC_PREFIX = "costs"
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of the process in bytes, or 0 where it cannot be measured.
+    """
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+class Span:
+    """
+    One timed stage; use as a context manager and report volumes with add().
+    """
+
+    __slots__ = ("tracer", "name", "attrs", "start", "wall", "cpu", "bytes", "rows", "peak_rss", "thread", "error",
+                 "_wall_start", "_cpu_start")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.bytes = 0
+        self.rows = 0
+        self.error = None
+
+    def add(self, bytes=0, rows=0):
+        """
+        Adds transferred bytes and processed rows to the span.
+        """
+        self.bytes += bytes
+        self.rows += rows
+
+    def set(self, **attrs):
+        """
+        Adds attributes known only once the stage ran to the JSON trace.
+        """
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.thread = threading.get_ident()
+        self.start = time.time()
+        self._cpu_start = time.process_time()
+        self._wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall = time.perf_counter() - self._wall_start
+        # Process wide, so stages fanning out to threads include their workers' CPU time
+        self.cpu = time.process_time() - self._cpu_start
+        self.peak_rss = peak_rss()
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.tracer._record(self)
+        return False
+
+
+class _NullSpan:
+    """
+    Stand-in returned while tracing is disabled, so instrumented code costs a function call and nothing else.
+    """
+
+    __slots__ = ()
+
+    def add(self, bytes=0, rows=0):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects per-stage wall time, CPU time, bytes, rows and peak RSS of the report pipeline.
+
+    The last MAX_SPANS spans are kept for a JSON trace; totals per stage are kept for the Prometheus export,
+    so a long-running worker never grows without bound.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._spans = deque(maxlen=MAX_SPANS)
+        self._stages = {}
+
+    def span(self, name, **attrs):
+        """
+        Returns a context manager timing the stage `name`; attrs are recorded in the JSON trace.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attrs)
+
+    def _record(self, span):
+        with self._lock:
+            self._spans.append(span)
+            stage = self._stages.get(span.name)
+            if stage is None:
+                stage = self._stages[span.name] = dict(calls=0, errors=0, wall=0.0, cpu=0.0, bytes=0, rows=0, last=0.0)
+            stage["calls"] += 1
+            stage["errors"] += span.error is not None
+            stage["wall"] += span.wall
+            stage["cpu"] += span.cpu
+            stage["bytes"] += span.bytes
+            stage["rows"] += span.rows
+            stage["last"] = span.wall
+
+    def summary(self):
+        """
+        Returns {stage: {calls, errors, wall, cpu, bytes, rows, last}} with times in seconds.
+        """
+        with self._lock:
+            return {name: dict(stage) for name, stage in self._stages.items()}
+
+    def trace(self):
+        """
+        Returns the recorded spans in the Chrome trace event format, viewable in Perfetto or chrome://tracing.
+        """
+        with self._lock:
+            spans = list(self._spans)
+        events = [
+            {
+                "name": span.name,
+                "cat": "costs",
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.wall * 1e6,
+                "pid": os.getpid(),
+                "tid": span.thread,
+                "args": {
+                    **{key: str(value) for key, value in span.attrs.items()},
+                    "cpu_seconds": span.cpu,
+                    "bytes": span.bytes,
+                    "rows": span.rows,
+                    "peak_rss_bytes": span.peak_rss,
+                    **({"error": span.error} if span.error else {}),
+                },
+            }
+            for span in spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"summary": self.summary()}}
+
+    def write_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
+
+    def prometheus(self, prefix=METRIC_PREFIX):
+        """
+        Returns the per-stage totals in the Prometheus text exposition format.
+        """
+        stages = self.summary()
+        metrics = [
+            ("stage_calls_total", "counter", "Stage executions", "calls"),
+            ("stage_errors_total", "counter", "Stage executions that raised", "errors"),
+            ("stage_wall_seconds_total", "counter", "Wall time spent in the stage", "wall"),
+            ("stage_cpu_seconds_total", "counter", "Process CPU time spent in the stage", "cpu"),
+            ("stage_bytes_total", "counter", "Bytes transferred by the stage", "bytes"),
+            ("stage_rows_total", "counter", "Rows processed by the stage", "rows"),
+            ("stage_last_wall_seconds", "gauge", "Wall time of the latest execution of the stage", "last"),
+        ]
+        lines = []
+        for name, kind, help_text, field in metrics:
+            lines.append(f"# HELP {prefix}_{name} {help_text}.")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for stage, values in sorted(stages.items()):
+                lines.append(f'{prefix}_{name}{{stage="{_escape(stage)}"}} {values[field]!r}')
+        lines.append(f"# HELP {prefix}_peak_rss_bytes Peak resident set size of the process.")
+        lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+        lines.append(f"{prefix}_peak_rss_bytes {peak_rss()}")
+        lines.append(f"# HELP {prefix}_start_time_seconds Start time of the process since the epoch.")
+        lines.append(f"# TYPE {prefix}_start_time_seconds gauge")
+        lines.append(f"{prefix}_start_time_seconds {self.started!r}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Writes the metrics to a file, e.g. for the node exporter textfile collector, or '-' for stdout.
+        """
+        if path == "-":
+            sys.stdout.write(self.prometheus())
+            return
+        # Write then rename so a collector never reads a half written file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.",
+                                   suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    def push(self, gateway_url, job="costs", timeout=10):
+        """
+        Pushes the metrics to a Prometheus Pushgateway, replacing the previous push of the job.
+        """
+        request = urllib.request.Request(
+            f"{gateway_url.rstrip('/')}/metrics/job/{job}",
+            data=self.prometheus().encode(),
+            method="PUT",
+            headers={"Content-Type": "text/plain; version=0.0.4"},
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+TRACER = Tracer(enabled=os.getenv("COSTS_TRACE", "").lower() in ("1", "true"))
+
+
+def span(name, **attrs):
+    """
+    Times a stage on the process wide tracer, see Tracer.span.
+    """
+    return TRACER.span(name, **attrs)
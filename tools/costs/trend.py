@@ -0,0 +1,352 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import cache
+    from . import frame as cost_frame
+except ImportError:  # running as a script next to the shipped modules
+    import cache
+    import frame as cost_frame
+
+DEFAULT_TREND_DIR = os.path.join(cache.DEFAULT_CACHE_DIR, "trends")
+DEFAULT_BASELINE_DAYS = 14
+DEFAULT_THRESHOLD = 3.0  # z-score past which a day is reported as a regression
+MIN_BASELINE_DAYS = 3  # fewer days of history give no z-score
+MIN_RELATIVE_STD = 0.05  # floor of the baseline deviation relative to its mean, so flat series stay finite
+WEEK = 7
+
+COSTS = [metric for metric in cache.COLUMNS if metric.endswith("Cost")]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def trend_path(cluster, aggregate, trend_dir=DEFAULT_TREND_DIR):
+    """
+    Returns where the series of an OpenCost endpoint and aggregation are kept.
+    """
+    key = hashlib.sha1(f"{cluster}|{aggregate}".encode()).hexdigest()[:16]
+    return os.path.join(trend_dir, f"{key}.npz")
+
+
+def _capacity(needed, current):
+    while current < needed:
+        current = max(2 * current, 8)
+    return current
+
+
+class TrendSeries:
+    """
+    Daily series of every namespace's metrics as dense (namespace x day) float64 arrays.
+
+    Next to the values the series keeps running prefix sums over the days (values, squares and days
+    present), so the mean and deviation of any window, for every namespace at once, are two column
+    differences. Appending a day writes one column of each array and never revisits history; the arrays
+    grow by doubling so appends stay amortized O(namespaces).
+
+    Costs of a namespace absent on a day after it first appeared count as 0; efficiencies only average the
+    days it was present.
+    """
+
+    def __init__(self, metrics=cache.COLUMNS):
+        self.metrics = list(metrics)
+        self.names = []
+        self.days = []
+        self._rows = {}
+        self._first = np.zeros(0, dtype=np.intp)  # day index each namespace first appeared on
+        self._values = {metric: np.zeros((0, 0)) for metric in self.metrics}
+        self._present = np.zeros((0, 0), dtype=bool)
+        # Prefix sums over days with a leading zero column: _sums[m][:, d] sums the days before d
+        self._sums = {metric: np.zeros((0, 1)) for metric in self.metrics}
+        self._squares = {metric: np.zeros((0, 1)) for metric in self.metrics}
+        self._counts = np.zeros((0, 1), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def next_day(self):
+        """
+        The day append_day expects next, None while the series is empty.
+        """
+        return self.days[-1] + timedelta(days=1) if self.days else None
+
+    def _grow(self, rows, days):
+        capacity_rows, capacity_days = self._present.shape
+        if rows <= capacity_rows and days <= capacity_days:
+            return
+        capacity_rows = _capacity(rows, capacity_rows)
+        capacity_days = _capacity(days, capacity_days)
+
+        def grown(array, extra_day=0):
+            bigger = np.zeros((capacity_rows, capacity_days + extra_day), dtype=array.dtype)
+            bigger[:array.shape[0], :array.shape[1]] = array
+            return bigger
+
+        self._values = {metric: grown(values) for metric, values in self._values.items()}
+        self._present = grown(self._present)
+        self._sums = {metric: grown(sums, 1) for metric, sums in self._sums.items()}
+        self._squares = {metric: grown(squares, 1) for metric, squares in self._squares.items()}
+        self._counts = grown(self._counts, 1)
+        first = np.zeros(capacity_rows, dtype=np.intp)
+        first[:len(self._first)] = self._first
+        self._first = first
+
+    def append_day(self, day, names, columns):
+        """
+        Appends one day of allocations, e.g. as returned by AllocationCache.get_day.
+
+        Namespaces seen for the first time get a row with an empty history. Days must be appended in order,
+        one after the other; a day already in the series is ignored.
+
+        Returns:
+        - True if the day was appended.
+        """
+        if self.days and day <= self.days[-1]:
+            return False
+        if self.days and day != self.next_day:
+            raise ValueError(f"Expected {self.next_day:%Y-%m-%d}, got {day:%Y-%m-%d}")
+
+        column = len(self.days)
+        known = len(self.names)
+        for name in names:
+            if name not in self._rows:
+                self._rows[name] = len(self.names)
+                self.names.append(name)
+        self._grow(len(self.names), column + 1)
+        self._first[known:len(self.names)] = column
+        rows = np.fromiter((self._rows[name] for name in names), dtype=np.intp, count=len(names))
+        count = len(self.names)
+
+        self._present[rows, column] = True
+        self._counts[:count, column + 1] = self._counts[:count, column] + self._present[:count, column]
+        for metric in self.metrics:
+            values = self._values[metric]
+            values[rows, column] = np.asarray(columns[metric], dtype=np.float64)
+            self._sums[metric][:count, column + 1] = self._sums[metric][:count, column] + values[:count, column]
+            self._squares[metric][:count, column + 1] = (
+                self._squares[metric][:count, column] + values[:count, column] ** 2
+            )
+        self.days.append(day)
+        return True
+
+    def values(self, metric):
+        """
+        Returns the (namespace x day) array of a metric.
+        """
+        return self._values[metric][:len(self.names), :len(self.days)]
+
+    def present(self):
+        """
+        Returns the (namespace x day) mask of the days each namespace had allocations.
+        """
+        return self._present[:len(self.names), :len(self.days)]
+
+    def _day_index(self, at):
+        last = len(self.days) - 1
+        return np.asarray(last if at is None else at, dtype=np.intp)
+
+    def window(self, metric, end, length):
+        """
+        Returns the mean, standard deviation and day count of the `length` days before day index `end`.
+
+        `end` may be an array of day indexes to get every window at once as (namespace x len(end)) arrays.
+        """
+        count = len(self.names)
+        end = np.asarray(end, dtype=np.intp)
+        start = np.maximum(end - length, 0)
+        sums = self._sums[metric][:count, end] - self._sums[metric][:count, start]
+        squares = self._squares[metric][:count, end] - self._squares[metric][:count, start]
+        if metric in COSTS:
+            first = self._first[:count] if end.ndim == 0 else self._first[:count, None]
+            days = np.maximum(end - np.maximum(start, first), 0).astype(np.float64)
+        else:
+            days = (self._counts[:count, end] - self._counts[:count, start]).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(days > 0, sums / days, np.nan)
+            std = np.sqrt(np.maximum(np.where(days > 0, squares / days, np.nan) - mean ** 2, 0.0))
+        return mean, std, days
+
+    def baseline(self, metric, days=DEFAULT_BASELINE_DAYS, at=None):
+        """
+        Returns the rolling baseline (mean, standard deviation, day count) of the days before `at`.
+
+        Parameters:
+        - metric (str): One of the cache columns, e.g. 'totalCost' or 'cpuEfficiency'.
+        - days (int): Length of the baseline window.
+        - at: Day index or array of day indexes evaluated, defaults to the last day.
+        """
+        return self.window(metric, self._day_index(at), days)
+
+    def zscores(self, metric, days=DEFAULT_BASELINE_DAYS, at=None):
+        """
+        Returns how many baseline deviations each namespace's value on day `at` is from its baseline.
+
+        The deviation is floored at MIN_RELATIVE_STD of the mean so a flat history does not turn every change
+        into an infinite score. Namespaces with fewer than MIN_BASELINE_DAYS of history, or no efficiency on
+        the day, get NaN.
+        """
+        at = self._day_index(at)
+        count = len(self.names)
+        mean, std, history = self.baseline(metric, days, at)
+        value = self._values[metric][:count, at]
+        std = np.maximum(std, MIN_RELATIVE_STD * np.abs(mean))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = (value - mean) / std
+            scores = np.where(std > 0, scores, np.where(value == mean, 0.0, np.sign(value - mean) * np.inf))
+        scores[history < MIN_BASELINE_DAYS] = np.nan
+        if metric not in COSTS:
+            scores[~self._present[:count, at]] = np.nan
+        return scores
+
+    def week_over_week(self, metric, at=None):
+        """
+        Returns (this week, previous week, delta) per namespace for the 7 days ending with day `at`.
+
+        Costs are summed over each week, efficiencies averaged over the days present.
+        """
+        end = self._day_index(at) + 1
+        this_week, _, this_days = self.window(metric, end, WEEK)
+        previous, _, previous_days = self.window(metric, np.maximum(end - WEEK, 0), WEEK)
+        if metric in COSTS:
+            this_week, previous = np.nan_to_num(this_week * this_days), np.nan_to_num(previous * previous_days)
+        return this_week, previous, this_week - previous
+
+    def regressions(self, days=DEFAULT_BASELINE_DAYS, threshold=DEFAULT_THRESHOLD, min_cost=0.0):
+        """
+        Ranks the namespaces whose last day regressed against their rolling baseline.
+
+        A namespace regresses when its daily cost is `threshold` deviations above its baseline, or its CPU or
+        RAM efficiency that far below. Each regression is priced in dollars: the cost above the baseline,
+        and for efficiencies the extra idle share of the day's CPU or RAM cost. Rows are ranked by that
+        impact.
+
+        Returns:
+        - Frame with the namespace, the day's metrics, their baselines, z-scores and week-over-week deltas,
+          `impact`, `kind` and `z`, the z-score of the regression with the biggest impact, biggest impact first.
+        """
+        if not self.days:
+            return pd.DataFrame(columns=["namespace", "impact", "kind", "z"])
+        count = len(self.names)
+        last = len(self.days) - 1
+        cost = self._values["totalCost"][:count, last]
+
+        columns = {"namespace": pd.Categorical(np.asarray(self.names, dtype=str)), "totalCost": cost}
+        cost_mean, _, _ = self.baseline("totalCost", days)
+        cost_z = self.zscores("totalCost", days)
+        this_week, previous, delta = self.week_over_week("totalCost")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            change = np.where(previous > 0, delta / previous, np.nan)
+        columns.update(baselineCost=cost_mean, costZ=cost_z, weekCost=this_week, weekCostDelta=delta,
+                       weekCostChange=change)
+        excess = np.where(cost_z > threshold, cost - cost_mean, 0.0)
+        impact = np.nan_to_num(excess)
+        kinds = [np.where(excess > 0, "cost", "")]
+        impacts, scores_by_kind = [impact], [cost_z]
+
+        for metric, metric_cost, label in (("cpuEfficiency", "cpuCost", "cpu"), ("ramEfficiency", "ramCost", "ram")):
+            value = self._values[metric][:count, last]
+            mean, _, _ = self.baseline(metric, days)
+            scores = self.zscores(metric, days)
+            _, _, efficiency_delta = self.week_over_week(metric)
+            wasted = np.where(scores < -threshold, (mean - value) * self._values[metric_cost][:count, last], 0.0)
+            wasted = np.nan_to_num(wasted)
+            impact = impact + wasted
+            kinds.append(np.where(wasted > 0, label + "Efficiency", ""))
+            impacts.append(wasted)
+            scores_by_kind.append(scores)
+            columns.update({
+                metric: value,
+                f"baseline{label.capitalize()}Efficiency": mean,
+                f"{metric}Z": scores,
+                f"{metric}WeekDelta": efficiency_delta,
+            })
+
+        strongest = np.argmax(np.stack(impacts), axis=0)
+        columns.update(
+            impact=impact,
+            kind=[",".join(filter(None, parts)) for parts in zip(*kinds)],
+            z=np.stack(scores_by_kind)[strongest, np.arange(count)],
+        )
+        report = pd.DataFrame(columns)
+        report = report[(report["impact"].to_numpy() > 0) & (cost >= min_cost)]
+        return cost_frame.rank(report, by="impact")
+
+    def save(self, path, keep=None):
+        """
+        Writes the series atomically; prefix sums are rebuilt on load.
+
+        Parameters:
+        - path (str): Series file, see trend_path.
+        - keep (int): Only write the last `keep` days, and the namespaces present in them, to bound the file.
+        """
+        first = max(len(self.days) - keep, 0) if keep else 0
+        present = self.present()[:, first:]
+        rows = np.flatnonzero(present.any(axis=1))
+        ordinals = np.array([(day - _EPOCH).days for day in self.days[first:]], dtype=np.int64)
+        cache.atomic_write(path, lambda f: np.savez(
+            f,
+            names=np.asarray(self.names, dtype=str)[rows],
+            days=ordinals,
+            present=present[rows],
+            **{metric: self.values(metric)[rows, first:] for metric in self.metrics},
+        ))
+
+    @classmethod
+    def load(cls, path, metrics=cache.COLUMNS):
+        """
+        Reads a series written by save(), or returns an empty one if there is none.
+        """
+        series = cls(metrics)
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                names = [str(name) for name in stored["names"]]
+                days = [_EPOCH + timedelta(days=int(ordinal)) for ordinal in stored["days"]]
+                present = stored["present"]
+                values = {metric: stored[metric] for metric in series.metrics}
+        except (OSError, KeyError, ValueError):
+            return series
+
+        series.names, series.days = names, days
+        series._rows = {name: row for row, name in enumerate(names)}
+        series._first = np.argmax(present, axis=1).astype(np.intp) if len(days) else np.zeros(len(names), np.intp)
+        series._present = present
+        series._values = values
+        zero = np.zeros((len(names), 1))
+        for metric, array in values.items():
+            series._sums[metric] = np.hstack([zero, np.cumsum(array, axis=1)])
+            series._squares[metric] = np.hstack([zero, np.cumsum(array ** 2, axis=1)])
+        series._counts = np.hstack([zero.astype(np.int64), np.cumsum(present, axis=1)])
+        return series
+
+
+def format_regressions(report):
+    """
+    Renders a regressions report as display strings, indexed by row label like format_frame.
+    """
+    dimensions = [column for column in report.columns if column in ("cluster", "namespace")]
+    labels = report[dimensions[0]].astype(str).to_numpy()
+    for dimension in dimensions[1:]:
+        labels = np.char.add(np.char.add(labels, "/"), report[dimension].astype(str).to_numpy())
+
+    def percent(column):
+        return cost_frame.format_percent(np.nan_to_num(report[column].to_numpy()) * 100)
+
+    return pd.DataFrame(
+        {
+            "kind": report["kind"].to_numpy(),
+            "z": np.char.mod("%.1f", report["z"].to_numpy(dtype=np.float64)),
+            "impact": cost_frame.format_cost(report["impact"].to_numpy()),
+            "totalCost": cost_frame.format_cost(report["totalCost"].to_numpy()),
+            "baselineCost": cost_frame.format_cost(np.nan_to_num(report["baselineCost"].to_numpy())),
+            "weekCostChange": percent("weekCostChange"),
+            "cpuEfficiency": percent("cpuEfficiency"),
+            "baselineCpuEfficiency": percent("baselineCpuEfficiency"),
+            "ramEfficiency": percent("ramEfficiency"),
+            "baselineRamEfficiency": percent("baselineRamEfficiency"),
+        },
+        index=labels,
+    )
@@ -0,0 +1,177 @@
+import http.client
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+DEFAULT_PORT = 8787
+DEFAULT_RESULT_TTL = 30.0  # identical requests shortly after a report are served from its result
+
+
+class Coalescer:
+    """
+    Collapses concurrent calls with the same key into a single computation.
+
+    The first caller of a key runs it; callers arriving while it is in flight wait for the same result.
+    Finished results are reused for `ttl` seconds so a burst of identical requests costs one computation;
+    failures, raised or returned as None, are not, the next caller tries again.
+    """
+
+    def __init__(self, ttl=DEFAULT_RESULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._results = {}
+
+    def run(self, key, compute):
+        """
+        Returns compute() for `key`, sharing it with every concurrent caller of the same key.
+
+        Returns:
+        - Tuple of (result, coalesced) where coalesced is True if the result came from another caller.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._results = {k: v for k, v in self._results.items() if now - v[0] < self.ttl}
+            if key in self._results:
+                return self._results[key][1], True
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if result is not None:
+                self._results[key] = (time.monotonic(), result)
+        future.set_result(result)
+        return result, False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "costs-worker"
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _reply(self, status, body, content_type="application/json"):
+        payload = body.encode() if isinstance(body, str) else json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/healthz":
+            self._reply(200, {"status": "ok"})
+            return
+        if url.path == "/metrics" and self.server.metrics:
+            self._reply(200, self.server.metrics(), "text/plain; version=0.0.4")
+            return
+        if url.path != "/report":
+            self._reply(404, {"error": f"Unknown path {url.path}"})
+            return
+
+        params = dict(parse_qsl(url.query))
+        key = tuple(sorted(params.items()))
+        try:
+            result, coalesced = self.server.coalescer.run(
+                key, lambda: self.server.report(session=self.server.session, **params)
+            )
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+            return
+        if result is None:
+            self._reply(502, {"error": "Report failed, see the worker log"})
+            return
+        self._reply(200, {"result": result, "coalesced": coalesced})
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(report, session=None, host="127.0.0.1", port=DEFAULT_PORT, socket_path=None,
+                result_ttl=DEFAULT_RESULT_TTL, metrics=None):
+    """
+    Builds a long-running report server that keeps imports, the HTTP session and caches warm.
+
+    Parameters:
+    - report (callable): report(session=..., **string options) -> JSON-serializable result or None.
+    - session (requests.Session): Pooled session shared by every report.
+    - host, port: TCP address to listen on, used when socket_path is not given.
+    - socket_path (str): Listen on a Unix socket instead of TCP.
+    - result_ttl (float): Seconds a finished report is reused for identical requests.
+    - metrics (callable): Returns Prometheus text metrics served at /metrics.
+
+    Returns:
+    - Server; call serve_forever() on it.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    server.report = report
+    server.session = session
+    server.coalescer = Coalescer(result_ttl)
+    server.metrics = metrics
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request_report(worker, request_timeout=600, **params):
+    """
+    Asks a running worker for a report.
+
+    Parameters:
+    - worker (str): 'http://host:port' or 'unix:///path/to/socket'.
+    - request_timeout (float): Seconds to wait for the worker's reply.
+    - params: String options forwarded to the report, e.g. window='30d' or timeout='30s'.
+
+    Returns:
+    - The report result.
+    """
+    url = urlparse(worker)
+    if url.scheme == "unix":
+        connection = _UnixHTTPConnection(url.path, timeout=request_timeout)
+    else:
+        connection = http.client.HTTPConnection(url.hostname, url.port or DEFAULT_PORT, timeout=request_timeout)
+    try:
+        connection.request("GET", f"/report?{urlencode(params)}")
+        response = connection.getresponse()
+        body = json.loads(response.read() or b"{}")
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"Worker returned {response.status}: {body.get('error')}")
+    return body["result"]